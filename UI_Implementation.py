@@ -1,13 +1,12 @@
 import tkinter as tk
 from tkinter import messagebox
-import numpy as np
-import random
-
-ROWS = 6
-COLUMNS = 7
-PLAYER = 1
-COMPUTER = 2
-EMPTY = 0
+import threading
+import queue
+from bitboard import Position, ROWS, COLUMNS, PLAYER, COMPUTER
+from engine import Engine
+from opening_book import load_book
+from search_cache import SearchCache
+
 CELL_SIZE = 60
 PADDING = 10
 
@@ -16,8 +15,28 @@ MEDIUM_COLOR = '#2563eb'  # Blue
 HARD_COLOR = '#ef4444'    # Red
 PLAYER_COLOR = '#fde047'  # Yellow
 COMPUTER_COLOR = '#ef4444' # Red
+EMPTY_COLOR = '#1e3a8a'    # Dark blue
+
+# Difficulty levels as (maximum search depth, time budget in seconds per move).
+# None for the depth lets the search go as deep as the budget allows.
+DIFFICULTY_SETTINGS = {
+    1: (2, 0.25),
+    2: (4, 0.5),
+    3: (None, 1.0),
+}
+
+# Milliseconds between two checks of the background search for a result
+SEARCH_POLL_INTERVAL = 30
+
+# Show the branching factor and cutoff rate of the search while the computer
+# thinks; collecting them makes the search somewhat slower
+SHOW_SEARCH_STATS = True
+
+# Keep deep search results in search_cache.bin so positions searched in earlier
+# games, also before a restart, are answered without searching them again
+USE_SEARCH_CACHE = True
 
-class ConnectFour:
+class ConnectFour(Engine):
     def __init__(self):
         # Construction of the game window
         self.window = tk.Tk()
@@ -25,11 +44,25 @@ class ConnectFour:
         self.window.configure(bg='#1e3a8a')
         
         # Initialize game state
-        self.board = np.zeros((ROWS, COLUMNS), dtype=int)
+        super().__init__()
         self.game_over = False
         self.current_player = PLAYER
         self.ai_difficulty = None  # Changed: No default difficulty
         self.game_started = False  # New: Track if game has started
+        if SHOW_SEARCH_STATS:
+            self.enable_stats()
+
+        # Background search for the computer's moves
+        self.search_thread = None
+        self.search_results = queue.Queue()
+        self.search_id = 0
+
+        # Precomputed moves for the first plies, if a book has been generated
+        self.opening_book = load_book()
+
+        # The cache file is only read once the first search needs it
+        if USE_SEARCH_CACHE:
+            self.search_cache = SearchCache()
         
         # Create difficulty controls
         self.create_difficulty_controls()
@@ -98,18 +131,37 @@ class ConnectFour:
         )
         self.canvas.pack(padx=20, pady=10)
         
-        # Create cells
+        # Create cells once; moves and resets only recolor them, so the
+        # number of canvas items never grows. cell_items[row][col] is the
+        # oval of a board row, row 0 at the bottom
+        self.cell_items = []
         for row in range(ROWS):
+            row_items = []
             for col in range(COLUMNS):
                 x = col * CELL_SIZE + PADDING
-                y = row * CELL_SIZE + PADDING
-                self.canvas.create_oval(
+                y = (ROWS - 1 - row) * CELL_SIZE + PADDING
+                row_items.append(self.canvas.create_oval(
                     x + 5, y + 5,
                     x + CELL_SIZE - 5,
                     y + CELL_SIZE - 5,
-                    fill='#1e3a8a',
-                    outline='#1e3a8a'
-                )
+                    fill=EMPTY_COLOR,
+                    outline=EMPTY_COLOR
+                ))
+            self.cell_items.append(row_items)
+
+        # Preview of the player's piece above the hovered column, moved
+        # instead of recreated and hidden while there is nothing to show
+        self.hover_item = self.canvas.create_oval(
+            PADDING + 5, 5,
+            PADDING + CELL_SIZE - 5,
+            CELL_SIZE - 5,
+            fill=PLAYER_COLOR,
+            outline=PLAYER_COLOR,
+            stipple='gray50',
+            state=tk.HIDDEN
+        )
+        self.hover_column = None
+
         # Bind Mouse Events 
         self.canvas.bind('<Button-1>', self.handle_click)
         self.canvas.bind('<Motion>', self.handle_hover)
@@ -120,19 +172,15 @@ class ConnectFour:
             return
             
         col = (event.x - PADDING) // CELL_SIZE
-        if 0 <= col < COLUMNS:
-            self.canvas.delete('hover')
+        # Motion within the same column changes nothing on the canvas
+        if 0 <= col < COLUMNS and col != self.hover_column:
+            self.hover_column = col
             if self.is_valid_move(col):
                 x = col * CELL_SIZE + PADDING
-                self.canvas.create_oval(
-                    x + 5, 5,
-                    x + CELL_SIZE - 5,
-                    CELL_SIZE - 5,
-                    fill='#fde047',
-                    outline='#fde047',
-                    stipple='gray50',
-                    tags='hover'
-                )
+                self.canvas.coords(self.hover_item, x + 5, 5, x + CELL_SIZE - 5, CELL_SIZE - 5)
+                self.canvas.itemconfig(self.hover_item, state=tk.NORMAL)
+            else:
+                self.canvas.itemconfig(self.hover_item, state=tk.HIDDEN)
 
     def handle_click(self, event):
         # Check if game has started
@@ -152,9 +200,10 @@ class ConnectFour:
         if not self.is_valid_move(col):
             return
             
-        row = self.get_next_row(col)
-        self.board[row][col] = self.current_player
+        row = self.board.play(col, self.current_player)
         self.draw_piece(row, col)
+        # The column may be full now, so the next motion shows the preview again
+        self.hover_column = None
         
         if self.check_winner(self.current_player):
             self.game_over = True
@@ -171,262 +220,100 @@ class ConnectFour:
         self.status_label.config(text="Computer thinking..." if self.current_player == COMPUTER else "Your turn!")
         
         if self.current_player == COMPUTER:
-            self.window.after(1000, self.make_computer_move)
+            self.make_computer_move()
 
     def make_computer_move(self):
-        col, _ = self.minimax(self.board, self.ai_difficulty, -float('inf'), float('inf'), False)
-        self.make_move(col)
-
-    def draw_piece(self, row, col):
-        x = col * CELL_SIZE + PADDING
-        y = (ROWS - 1 - row) * CELL_SIZE + PADDING
-        color = '#fde047' if self.current_player == PLAYER else '#ef4444'
-        
-        self.canvas.create_oval(
-            x + 5, y + 5,
-            x + CELL_SIZE - 5,
-            y + CELL_SIZE - 5,
-            fill=color,
-            outline=color
-        )
+        """Search for the computer's move on a worker thread so the window stays responsive"""
+        self.cancel_search()
+        self.search_cancelled.clear()
 
-    def is_valid_move(self, col):
-        return 0 <= col < COLUMNS and self.board[ROWS-1][col] == EMPTY
-
-    def get_next_row(self, col):
-        for row in range(ROWS):
-            if self.board[row][col] == EMPTY:
-                return row
-        return -1
-
-    def check_winner(self, player):
-        # Check horizontal
-        for row in range(ROWS):
-            for col in range(COLUMNS - 3):
-                if all(self.board[row][col + i] == player for i in range(4)):
-                    return True
-
-        # Check vertical
-        for row in range(ROWS - 3):
-            for col in range(COLUMNS):
-                if all(self.board[row + i][col] == player for i in range(4)):
-                    return True
-
-        # Check diagonal (positive slope)
-        for row in range(ROWS - 3):
-            for col in range(COLUMNS - 3):
-                if all(self.board[row + i][col + i] == player for i in range(4)):
-                    return True
-
-        # Check diagonal (negative slope)
-        for row in range(3, ROWS):
-            for col in range(COLUMNS - 3):
-                if all(self.board[row - i][col + i] == player for i in range(4)):
-                    return True
-
-        return False
-
-    def is_board_full(self):
-        return not any(self.board[ROWS-1][col] == EMPTY for col in range(COLUMNS))
-
-    def get_valid_columns(self, board):
-        return [col for col in range(COLUMNS) if board[ROWS-1][col] == EMPTY]
-
-    def next_free_row(self, col, board):
-        for row in range(ROWS):
-            if board[row][col] == EMPTY:
-                return row
-        return -1
-
-    def place_piece(self, row, col, player, board):
-        board[row][col] = player
+        max_depth, time_budget = self.ai_difficulty
+        col = self.probe_opening_book(max_depth)
+        if col is not None:
+            self.make_move(col)
+            return
 
-    def board_full(self, board):
-        return not any(board[ROWS-1][col] == EMPTY for col in range(COLUMNS))
-    
-    def count_lines(self, board, piece, x_in_a_row):
-        count = 0
+        # Cached scores stay valid from one move to the next, only the
+        # killers and history of the previous search are dropped
+        self.move_orderer.clear()
 
-        # Horizontal
-        for row in range(ROWS):
-            for col in range(COLUMNS - x_in_a_row + 1):
-                if all(board[row][col + i] == piece for i in range(x_in_a_row)):
-                    count += 1
-        # Vertical
-        for row in range(ROWS - x_in_a_row + 1):
-            for col in range(COLUMNS):
-                if all(board[row + i][col] == piece for i in range(x_in_a_row)):
-                    count += 1
-        # Diagonal (positive)
-        for row in range(ROWS - x_in_a_row + 1):
-            for col in range(COLUMNS - x_in_a_row + 1):
-                if all(board[row + i][col + i] == piece for i in range(x_in_a_row)):
-                    count += 1
-        # Diagonal (negative)
-        for row in range(x_in_a_row - 1, ROWS):
-            for col in range(COLUMNS - x_in_a_row + 1):
-                if all(board[row - i][col + i] == piece for i in range(x_in_a_row)):
-                    count += 1
-        return count
-    
-    """ Check to see if next move would lead to a 4-in-a-row """
-    def has_possible_four(self, board, piece):
-        # Helper function to check if an empty position is a valid move
-        def is_valid_move(row, col):
-            # Check if position is in bounds
-            if not (0 <= row < ROWS and 0 <= col < COLUMNS):
-                return False
-                
-            # Check if position is empty
-            if board[row][col] != EMPTY:
-                return False
-                
-            # Check if position has support beneath to make four in a row
-            return row == 0 or board[row-1][col] != EMPTY
-        
-        # Check a window of 4 positions
-        def check_window(window, positions):
-            # Count pieces and empty spaces
-            piece_count = window.count(piece)
-            empty_count = window.count(EMPTY)
-            
-            # If there are exactly 3 pieces and 1 empty space
-            if piece_count == 3 and empty_count == 1:
-                # Find where the empty space is
-                empty_index = window.index(EMPTY)
-                empty_row, empty_col = positions[empty_index]
-                
-                # Check valid move
-                if is_valid_move(empty_row, empty_col):
-                    return True
-            return False
-        
-        # Check horizontal windows
-        for row in range(ROWS):
-            for col in range(COLUMNS - 3):
-                window = [board[row][col + i] for i in range(4)]
-                positions = [(row, col + i) for i in range(4)]
-                if check_window(window, positions):
-                    return True
-        
-        # Check vertical windows
-        for row in range(ROWS - 3):
-            for col in range(COLUMNS):
-                window = [board[row + i][col] for i in range(4)]
-                positions = [(row + i, col) for i in range(4)]
-                if check_window(window, positions):
-                    return True
-        
-        # Check positive diagonal windows
-        for row in range(ROWS - 3):
-            for col in range(COLUMNS - 3):
-                window = [board[row + i][col + i] for i in range(4)]
-                positions = [(row + i, col + i) for i in range(4)]
-                if check_window(window, positions):
-                    return True
-        
-        # Check negative diagonal windows
-        for row in range(3, ROWS):
-            for col in range(COLUMNS - 3):
-                window = [board[row - i][col + i] for i in range(4)]
-                positions = [(row - i, col + i) for i in range(4)]
-                if check_window(window, positions):
-                    return True
-        
-        return False
-        
-    def score_position(self, board):
-        score = 0
-
-        evaluation_board = np.array([[1, 2, 2, 3, 2, 2, 1],
-                                     [2, 2, 3, 5, 3, 2, 2],
-                                     [2, 3, 4, 6, 4, 3, 2],
-                                     [2, 3, 4, 6, 4, 3, 2],
-                                     [2, 2, 3, 5, 3, 2, 2],
-                                     [1, 2, 2, 3, 2, 2, 1]])
-        
-        # Calculate the scores of the computer based on position on board
-        score -= np.sum(evaluation_board[board == COMPUTER])
-        score += np.sum(evaluation_board[board == PLAYER])
-        
-        # Calculate points for current piece (COMPUTER) based number of lines
-        score -= self.count_lines(board, COMPUTER, 3) * 100
-        score -= self.count_lines(board, COMPUTER, 2) * 10
-
-        # Recalculate points based on opponent's number of lines
-        score += self.count_lines(board, PLAYER, 3) * 80
-        score += self.count_lines(board, PLAYER, 2) * 8
-
-        # If opponent has a possible 4-in-a-row, prioritize stopping it
-        if (self.has_possible_four(board, PLAYER) == True):
-            score += 20000
-        if (self.has_possible_four(board, COMPUTER) == True):
-            score -= 10000
-
-        return score
-
-    def is_end_of_game(self, board):
-        return (self.check_winner(COMPUTER) or 
-                self.check_winner(PLAYER) or 
-                self.board_full(board))
-
-    def minimax(self, board, depth, alpha, beta, max_player):
-        valid_locations = self.get_valid_columns(board)
-        is_terminal = self.is_end_of_game(board)
-
-        if depth == 0 or is_terminal:
-            if is_terminal:
-                if self.check_winner(COMPUTER):
-                    return (None, -1000000)
-                elif self.check_winner(PLAYER):
-                    return (None, 1000000 + 5000)
-                else:  # Game is over, no more valid moves
-                    return (None, 0)
-            else:  # Depth is zero
-                return (None, self.score_position(board))
-        
-        # Maximize computer
-        if max_player:
-            value = -float('inf')
-            column = random.choice(valid_locations) if valid_locations else None
-
-            for col in valid_locations:
-                row = self.next_free_row(col, board)
-                temp_board = board.copy()
-                self.place_piece(row, col, PLAYER, temp_board)
-
-                # Calculate a score based on the position of the dropped piece
-                new_score = self.minimax(temp_board, depth-1, alpha, beta, False)[1]
-
-                if new_score > value:
-                    value = new_score
-                    column = col
-                alpha = max(alpha, value)
-                if alpha >= beta:
-                    break
-
-            return column, value
-        
-        else:  # Minimizing player
-            value = float('inf')
-            column = random.choice(valid_locations) if valid_locations else None
+        self.search_thread = threading.Thread(
+            target=self.run_search,
+            args=(self.search_id, self.board.copy(), max_depth, time_budget),
+            daemon=True
+        )
+        self.search_thread.start()
+        self.window.after(SEARCH_POLL_INTERVAL, self.poll_search, self.search_id)
+
+    def probe_opening_book(self, max_depth):
+        """Return the book move for the current board, or None to search instead"""
+        book = self.opening_book
+        # Book moves come from a deep search, which would make capped levels stronger
+        if book is None or (max_depth is not None and max_depth < book.depth):
+            return None
+        return book.probe(self.board)
+
+    def open_search_cache(self):
+        """Read the search cache before its first use, playing without it if the file is unusable"""
+        cache = self.search_cache
+        if cache is None or cache.loaded:
+            return
+        try:
+            cache.load()
+        except (OSError, ValueError):
+            # A stale or foreign file is left alone rather than overwritten
+            self.search_cache = None
+
+    def run_search(self, search_id, board, max_depth, time_budget):
+        # Runs on the worker thread; the Tk widgets are only touched by poll_search
+        # Every search puts a result or its error on the queue, or poll_search would wait forever
+        try:
+            self.open_search_cache()
+            col, _ = self.iterative_deepening(board, max_depth, time_budget=time_budget)
+        except Exception as error:
+            self.search_results.put((search_id, None, error))
+        else:
+            self.search_results.put((search_id, col, None))
+
+    def poll_search(self, search_id):
+        """Play the computer's move once the worker is done, otherwise show its progress"""
+        if search_id != self.search_id:
+            return  # The search was cancelled
+
+        try:
+            result_id, col, error = self.search_results.get_nowait()
+        except queue.Empty:
+            status = f"Computer thinking... depth {self.completed_depth}, {self.nodes:,} nodes"
+            if self.stats is not None and self.completed_depth > 1:
+                status += (f"\nbranching factor {self.stats.effective_branching_factor():.1f}, "
+                           f"{self.stats.first_move_cutoff_rate():.0%} cutoffs on the first move")
+            self.status_label.config(text=status)
+            self.window.after(SEARCH_POLL_INTERVAL, self.poll_search, search_id)
+            return
 
-            for col in valid_locations:
-                row = self.next_free_row(col, board)
-                temp_board = board.copy()
-                self.place_piece(row, col, COMPUTER, temp_board)
+        self.search_thread = None
+        if result_id != search_id:
+            return
+        if error is not None:
+            self.game_over = True
+            self.status_label.config(text=f"The computer could not move: {error}\nStart a new game")
+            return
+        self.make_move(col)
 
-                # Calculate a score based on the position of the dropped piece
-                new_score = self.minimax(temp_board, depth-1, alpha, beta, True)[1]
+    def cancel_search(self):
+        """Stop a running background search and drop its result"""
+        self.search_id += 1
+        if self.search_thread is not None:
+            self.search_cancelled.set()
+            self.search_thread.join()
+            self.search_thread = None
 
-                if new_score < value:
-                    value = new_score
-                    column = col
-                beta = min(beta, value)
-                if alpha >= beta:
-                    break
+        while not self.search_results.empty():
+            self.search_results.get_nowait()
 
-            return column, value
+    def draw_piece(self, row, col):
+        color = PLAYER_COLOR if self.current_player == PLAYER else COMPUTER_COLOR
+        self.canvas.itemconfig(self.cell_items[row][col], fill=color, outline=color)
 
     def reset_game(self):
         """Reset the game state and clear the board"""
@@ -435,40 +322,25 @@ class ConnectFour:
             messagebox.showinfo("Info", "Please select a difficulty level first!")
             return
             
+        # Stop the computer from answering a move of the previous game
+        self.cancel_search()
+
         # Reset game state
-        self.board = np.zeros((ROWS, COLUMNS), dtype=int)
+        self.board = Position()
         self.game_over = False
         self.current_player = PLAYER
         self.status_label.config(text="Your turn!")
         
-        # Clear the canvas completely
-        self.canvas.delete("all")
-        
-        # Recreate the empty board
-        for row in range(ROWS):
-            for col in range(COLUMNS):
-                x = col * CELL_SIZE + PADDING
-                y = row * CELL_SIZE + PADDING
-                self.canvas.create_oval(
-                    x + 5, y + 5,
-                    x + CELL_SIZE - 5,
-                    y + CELL_SIZE - 5,
-                    fill='#1e3a8a',
-                    outline='#1e3a8a'
-                )
-        
-        # Rebind events (just to be safe)
-        self.canvas.bind('<Button-1>', self.handle_click)
-        self.canvas.bind('<Motion>', self.handle_hover)
+        # Empty the existing cells instead of recreating them
+        for row_items in self.cell_items:
+            for item in row_items:
+                self.canvas.itemconfig(item, fill=EMPTY_COLOR, outline=EMPTY_COLOR)
+        self.canvas.itemconfig(self.hover_item, state=tk.HIDDEN)
+        self.hover_column = None
 
     def set_difficulty(self, level):
         """Set the AI difficulty level and start the game"""
-        if level == 1:
-            self.ai_difficulty = 2
-        elif level == 2:
-            self.ai_difficulty = 4
-        else:
-            self.ai_difficulty = 5
+        self.ai_difficulty = DIFFICULTY_SETTINGS[level]
         
         self.game_started = True  # New: Mark game as started
         self.reset_button.config(state=tk.NORMAL)  # Enable reset button
@@ -487,6 +359,9 @@ class ConnectFour:
 
     def run(self):
         self.window.mainloop()
+        self.cancel_search()
+        if self.search_cache is not None:
+            self.search_cache.close()
 
 if __name__ == "__main__":
     game = ConnectFour()
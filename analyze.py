@@ -0,0 +1,251 @@
+"""
+Streaming batch analysis of recorded positions.
+
+Reads positions one line at a time, searches each with the engine on a pool of
+worker processes and appends one JSON result per line to the output file.
+
+Input lines are either JSON objects with a "moves" string and an optional "id",
+or plain move strings (columns 0-6 from the empty board, player first). For
+plain lines only the last whitespace-separated field is read, so corpus files
+work as input too. Blank lines and lines starting with # are skipped.
+
+Only a bounded window of positions is in flight at once, and results are
+written in input order as soon as every earlier position is done, so memory
+stays flat however long the input is. An interrupted run continues where it
+stopped when started again with the same output file:
+
+    python3 analyze.py games.txt --output analysis.jsonl --config depth=8 --workers 4
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import json
+import os
+import random
+import sys
+import time
+
+from bitboard import Position, ROWS, COLUMNS, PLAYER, COMPUTER
+from arena import parse_config
+from engine import Engine
+from move_ordering import MoveOrderer
+from search_cache import SearchCache
+
+# Positions sent to a worker at once, so short searches are not dominated
+# by the cost of passing work between processes
+CHUNK_SIZE = 8
+
+# Chunks in flight per worker process
+IN_FLIGHT_PER_WORKER = 4
+
+# Engine of the worker process, built once by init_worker
+worker_engine = None
+worker_config = None
+
+
+def read_positions(lines):
+    """Yield (line number, id, moves) for every position line"""
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('{'):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_number, None, None
+                continue
+            yield line_number, record.get('id', line_number), record.get('moves')
+        else:
+            yield line_number, line_number, line.split()[-1]
+
+
+def replay(moves):
+    """Return the position after moves, or raise ValueError if they are not a legal unfinished game"""
+    if not isinstance(moves, str) or len(moves) > ROWS * COLUMNS:
+        raise ValueError("moves must be a string of columns")
+    position = Position()
+    for ply, move in enumerate(moves):
+        if not move.isdigit() or not position.can_play(int(move)):
+            raise ValueError(f"illegal move {move!r} at ply {ply + 1}")
+        if position.last_move_wins():
+            raise ValueError(f"moves continue after the game was won at ply {ply}")
+        position.play(int(move), PLAYER if ply % 2 == 0 else COMPUTER)
+    if position.last_move_wins() or position.is_full():
+        raise ValueError("the game is already over")
+    return position
+
+
+def init_worker(config, cache_path=None):
+    global worker_engine, worker_config
+    worker_engine = Engine(weights=config['weights'])
+    worker_engine.algorithm = config['algorithm']
+    # Read-only, so every worker can share the file and results stay reproducible
+    if cache_path is not None:
+        worker_engine.search_cache = SearchCache(cache_path, readonly=True)
+    worker_config = config
+
+
+def analyze_position(line_number, position_id, moves, seed):
+    """Search one position with the worker's engine; runs in a worker process"""
+    result = {'line': line_number, 'id': position_id, 'moves': moves}
+    try:
+        position = replay(moves)
+    except ValueError as error:
+        result['error'] = str(error)
+        return result
+
+    # A cold start and a fixed seed make the result independent of what
+    # this worker analyzed before, so resumed runs give the same answers
+    engine, config = worker_engine, worker_config
+    engine.transposition_table.clear()
+    engine.move_orderer = MoveOrderer(config['ordering'])
+    random.seed(seed + line_number)
+    max_player = position.num_moves % 2 == 0
+
+    start_time = time.perf_counter()
+    column, value = engine.iterative_deepening(position, config['max_depth'], config['time_budget'],
+                                               config['node_budget'], max_player=max_player)
+    result.update({
+        'to_move': 'player' if max_player else 'computer',
+        'column': column,
+        'score': value,
+        'depth': engine.completed_depth,
+        'nodes': engine.nodes,
+        'time': time.perf_counter() - start_time
+    })
+    return result
+
+
+def analyze_chunk(chunk, seed):
+    """Analyze a list of (line number, id, moves) in a worker process"""
+    return [analyze_position(line_number, position_id, moves, seed) for line_number, position_id, moves in chunk]
+
+
+def chunks(positions, size):
+    chunk = []
+    for item in positions:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def resume_point(path):
+    """Return the input line of the last complete result in path, dropping a partly written line"""
+    if not os.path.exists(path):
+        return 0
+
+    last_line = 0
+    complete_size = 0
+    with open(path, 'rb') as output_file:
+        for line in output_file:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                last_line = json.loads(line)['line']
+            except (ValueError, KeyError):
+                break
+            complete_size += len(line)
+
+    # An interrupted write leaves half a line behind, cut it off before appending
+    if complete_size != os.path.getsize(path):
+        with open(path, 'r+b') as output_file:
+            output_file.truncate(complete_size)
+    return last_line
+
+
+def analyze_stream(lines, output_file, config, workers=None, seed=0, start_after=0, progress=None, cache_path=None):
+    """Analyze every position after line start_after and write the results in input order"""
+    # Cache records do not say which weights scored them, they are only
+    # valid for the default evaluation
+    if cache_path is not None and config['weights']:
+        raise ValueError("a search cache can only be used with the default evaluation weights")
+    workers = workers or os.cpu_count()
+    max_in_flight = workers * IN_FLIGHT_PER_WORKER
+    positions = (item for item in read_positions(lines) if item[0] > start_after)
+    work = chunks(positions, CHUNK_SIZE)
+    pending = {}      # future -> chunk number
+    finished = {}     # chunk number -> results, waiting for earlier chunks
+    next_chunk = 0    # number of the next chunk to submit
+    next_write = 0    # number of the next chunk to write
+    written = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(config, cache_path)) as executor:
+        while True:
+            # Top up the window; finished chunks count too, so the buffer stays bounded
+            while len(pending) + len(finished) < max_in_flight:
+                chunk = next(work, None)
+                if chunk is None:
+                    break
+                pending[executor.submit(analyze_chunk, chunk, seed)] = next_chunk
+                next_chunk += 1
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                finished[pending.pop(future)] = future.result()
+
+            # Write every chunk whose earlier chunks are all written
+            while next_write in finished:
+                results = finished.pop(next_write)
+                for result in results:
+                    output_file.write(json.dumps(result) + '\n')
+                written += len(results)
+                next_write += 1
+            output_file.flush()
+            if progress is not None:
+                progress(written)
+
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze a file of positions with the engine")
+    parser.add_argument('input',
+                        help="file of move strings or JSON lines, - for standard input")
+    parser.add_argument('--output',
+                        help="JSON lines file the results are appended to, resumed if it exists; "
+                             "standard output when not given")
+    parser.add_argument('--config', default='depth=8',
+                        help="engine configuration, as for arena.py (depth, time, nodes, ordering, search, weights)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of processes analyzing positions")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="seed of the tie-breaks")
+    parser.add_argument('--cache', default=None,
+                        help="search cache file the workers read, for example the game's search_cache.bin; "
+                             "only with the default evaluation weights")
+    args = parser.parse_args()
+
+    config = parse_config(args.config)
+    if args.cache is not None and config['weights']:
+        parser.error("--cache can only be used with the default evaluation weights")
+    start_after = resume_point(args.output) if args.output else 0
+    if start_after:
+        print(f"Resuming after input line {start_after}", file=sys.stderr)
+
+    reported = [0]
+
+    def report(written):
+        if written >= reported[0] + 1000:
+            reported[0] = written - written % 1000
+            print(f"{reported[0]} positions analyzed", file=sys.stderr)
+
+    input_file = sys.stdin if args.input == '-' else open(args.input)
+    output_file = open(args.output, 'a') if args.output else sys.stdout
+    start_time = time.perf_counter()
+    try:
+        written = analyze_stream(input_file, output_file, config, args.workers, args.seed, start_after, report,
+                                 args.cache)
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+    elapsed = time.perf_counter() - start_time
+    print(f"Analyzed {written} positions in {elapsed:.1f}s", file=sys.stderr)
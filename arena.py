@@ -0,0 +1,207 @@
+"""
+Engine-vs-engine arena.
+
+Plays many headless games between two engine configurations on a process
+pool. Every opening is played twice with the colors swapped, so neither
+configuration profits from moving first, and the result is reported as
+win/draw/loss, an Elo difference with a 95% confidence margin, the average
+move latency of each side and the number of games played per second.
+
+A configuration is a comma separated list of settings, for example
+
+    python3 arena.py --first depth=4 --second depth=4,computer_triples=150 --games 200
+
+Settings are depth, time (seconds per move), nodes (node budget per move),
+ordering (a move ordering strategy), search (minimax or negamax) and any of
+the DEFAULT_WEIGHTS names.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import itertools
+import math
+import random
+import time
+
+from bitboard import Position, COLUMNS, PLAYER, COMPUTER
+from corpus import position_from_moves
+from engine import Engine, DEFAULT_WEIGHTS, SEARCH_ALGORITHMS
+from move_ordering import MoveOrderer, STRATEGIES
+
+# Score of a 95% confidence interval in standard errors
+CONFIDENCE_Z = 1.96
+
+
+def parse_config(text):
+    """Turn 'depth=4,time=0.5,player_pairs=10' into an engine configuration"""
+    config = {'max_depth': None, 'time_budget': None, 'node_budget': None, 'ordering': 'full',
+              'algorithm': 'negamax', 'weights': {}}
+    for setting in filter(None, text.split(',')):
+        name, _, value = setting.partition('=')
+        if name == 'depth':
+            config['max_depth'] = int(value)
+        elif name == 'time':
+            config['time_budget'] = float(value)
+        elif name == 'nodes':
+            config['node_budget'] = int(value)
+        elif name == 'ordering':
+            if value not in STRATEGIES:
+                raise ValueError(f"Unknown move ordering strategy: {value}")
+            config['ordering'] = value
+        elif name == 'search':
+            if value not in SEARCH_ALGORITHMS:
+                raise ValueError(f"Unknown search algorithm: {value}")
+            config['algorithm'] = value
+        elif name in DEFAULT_WEIGHTS:
+            config['weights'][name] = int(value)
+        else:
+            raise ValueError(f"Unknown engine setting: {name}")
+
+    if config['max_depth'] is None and config['time_budget'] is None and config['node_budget'] is None:
+        raise ValueError(f"Configuration '{text}' needs a depth, time or node budget")
+    return config
+
+
+def openings(plies, seed=0):
+    """Return every distinct opening of plies moves in an order shuffled by seed"""
+    found = {}
+    for moves in itertools.product(range(COLUMNS), repeat=plies):
+        position = Position()
+        for ply, col in enumerate(moves):
+            if not position.can_play(col) or position.last_move_wins():
+                break
+            position.play(col, PLAYER if ply % 2 == 0 else COMPUTER)
+        else:
+            if not position.last_move_wins():
+                found.setdefault(position.key(), ''.join(map(str, moves)))
+
+    result = sorted(found.values())
+    random.Random(seed).shuffle(result)
+    return result
+
+
+def play_game(first, second, opening, seed):
+    """Play one game from opening with first as the player and second as the computer
+
+    Runs in a worker process. Returns (winning configuration 0 or 1, or None
+    for a draw, move latencies of each configuration).
+    """
+    random.seed(seed)
+    board = position_from_moves(opening)
+    configs = (first, second)
+
+    engines = []
+    for config in configs:
+        engine = Engine(board, config['weights'])
+        engine.move_orderer = MoveOrderer(config['ordering'])
+        engine.algorithm = config['algorithm']
+        engines.append(engine)
+
+    latencies = ([], [])
+    # The player moves after an even number of moves
+    side = 0 if board.num_moves % 2 == 0 else 1
+    while True:
+        config = configs[side]
+        piece = PLAYER if side == 0 else COMPUTER
+
+        start_time = time.perf_counter()
+        column, _ = engines[side].iterative_deepening(board, config['max_depth'], config['time_budget'],
+                                                     config['node_budget'], max_player=piece == PLAYER)
+        latencies[side].append(time.perf_counter() - start_time)
+
+        board.play(column, piece)
+        if board.last_move_wins():
+            return side, latencies
+        if board.is_full():
+            return None, latencies
+        side = 1 - side
+
+
+def elo_difference(wins, draws, losses):
+    """Return the Elo difference implied by a score and its 95% confidence margin"""
+    games = wins + draws + losses
+    if not games:
+        return 0.0, math.inf
+    # A score of 0 or 1 is an infinite Elo difference, so the score is kept
+    # half a game away from either; the result is then a bound
+    low, high = 0.5 / games, 1 - 0.5 / games
+    score = min(max((wins + draws / 2) / games, low), high)
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = CONFIDENCE_Z * math.sqrt(variance / games)
+
+    def elo(score):
+        return 400 * math.log10(score / (1 - score))
+
+    return elo(score), (elo(min(score + margin, high)) - elo(max(score - margin, low))) / 2
+
+
+def run_arena(first, second, games, opening_plies=2, workers=None, seed=0):
+    """Play games between the two configurations, alternating colors, and return the totals"""
+    opening_list = openings(opening_plies, seed)
+    results = {'wins': 0, 'draws': 0, 'losses': 0, 'latencies': ([], []), 'games': 0}
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for game in range(games):
+            # Each opening is played twice, once with every configuration moving first
+            opening = opening_list[(game // 2) % len(opening_list)]
+            swapped = game % 2 == 1
+            configs = (second, first) if swapped else (first, second)
+            future = executor.submit(play_game, *configs, opening, seed + game)
+            futures[future] = swapped
+
+        for future in as_completed(futures):
+            swapped = futures[future]
+            winner, latencies = future.result()
+            if swapped:
+                winner = None if winner is None else 1 - winner
+                latencies = latencies[::-1]
+
+            if winner is None:
+                results['draws'] += 1
+            elif winner == 0:
+                results['wins'] += 1
+            else:
+                results['losses'] += 1
+            for side in (0, 1):
+                results['latencies'][side].extend(latencies[side])
+            results['games'] += 1
+
+    results['elapsed'] = time.perf_counter() - start_time
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play two engine configurations against each other")
+    parser.add_argument('--first', default='depth=4',
+                        help="configuration whose results are reported, e.g. depth=4,player_pairs=10")
+    parser.add_argument('--second', default='depth=4',
+                        help="opponent configuration")
+    parser.add_argument('--games', type=int, default=200,
+                        help="number of games, best kept even so every opening is played with both colors")
+    parser.add_argument('--opening-plies', type=int, default=2,
+                        help="number of moves of the openings the games start from")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of processes playing games")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="seed of the opening order and the tie-breaks")
+    args = parser.parse_args()
+
+    first, second = parse_config(args.first), parse_config(args.second)
+    results = run_arena(first, second, args.games, args.opening_plies, args.workers, args.seed)
+
+    wins, draws, losses = results['wins'], results['draws'], results['losses']
+    elo, margin = elo_difference(wins, draws, losses)
+    print(f"\n{args.first} vs {args.second}: {results['games']} games")
+    print("-" * 65)
+    print(f"Wins / Draws / Losses: {wins} / {draws} / {losses}")
+    if results['games'] and results['games'] in (wins, losses):
+        print(f"Elo difference: {elo:+.1f} or {'more' if wins else 'less'}, every game had the same result")
+    else:
+        print(f"Elo difference: {elo:+.1f} +/- {margin:.1f}")
+    for side, name in enumerate((args.first, args.second)):
+        latencies = results['latencies'][side]
+        average = sum(latencies) / len(latencies) if latencies else 0.0
+        print(f"Average move latency of {name}: {average * 1000:.2f} ms over {len(latencies)} moves")
+    print(f"Games per second: {results['games'] / results['elapsed']:.2f}")
+    print("-" * 65)
@@ -0,0 +1,473 @@
+"""
+Bitboard representation of a Connect Four position.
+
+Each player's pieces are stored in one integer mask. Bit (col * (rows + 1) + row)
+is set when that player owns the cell at (row, col), row 0 being the bottom row.
+The extra bit on top of every column is always empty and acts as a guard so
+that shifting a mask never wraps a line from one column into the next.
+
+The board size and the number of pieces in a row that wins are described by a
+Geometry, which generates every table the position and the search need. Python
+integers have no fixed width, so any size works. The module level constants
+and functions below belong to the standard 6 x 7 connect-four game.
+"""
+
+ROWS = 6
+COLUMNS = 7
+CONNECT = 4
+PLAYER = 1
+COMPUTER = 2
+EMPTY = 0
+
+# Certain piece positions have advantage
+EVALUATION_BOARD = [[1, 2, 2, 3, 2, 2, 1],
+                    [2, 2, 3, 5, 3, 2, 2],
+                    [2, 3, 4, 6, 4, 3, 2],
+                    [2, 3, 4, 6, 4, 3, 2],
+                    [2, 2, 3, 5, 3, 2, 2],
+                    [1, 2, 2, 3, 2, 2, 1]]
+
+
+class Geometry:
+    """Board size and connect length, with the masks and window tables generated for them
+
+    The evaluation counts lines of connect - 2 and connect - 1 pieces, the
+    pairs and triples of the standard game. Boards other than the standard
+    one get positional weights of half the number of winning lines through
+    each cell, which is what EVALUATION_BOARD approximates for 6 x 7.
+    """
+
+    def __init__(self, rows=ROWS, columns=COLUMNS, connect=CONNECT):
+        if rows < 1 or columns < 1:
+            raise ValueError(f"Board must have at least one row and column, got {rows} x {columns}")
+        if not 3 <= connect <= max(rows, columns):
+            raise ValueError(f"Connect length must be between 3 and {max(rows, columns)}, got {connect}")
+
+        self.rows = rows
+        self.columns = columns
+        self.connect = connect
+        self.cells = rows * columns
+        # Height of a column including its guard bit
+        self.column_height = rows + 1
+
+        # Shift amounts for the four line directions: vertical, horizontal,
+        # up and to the right, down and to the right
+        self.directions = (1, self.column_height, self.column_height + 1, self.column_height - 1)
+
+        self.bottom_mask = sum(self.cell_bit(0, col) for col in range(columns))
+        self.board_mask = self.bottom_mask * ((1 << rows) - 1)
+        # All bits of one column, guard bit included
+        self.column_mask = (1 << self.column_height) - 1
+
+        # Columns from the center outwards: center pieces belong to the most lines
+        self.center_order = sorted(range(columns), key=lambda col: abs(2 * col - (columns - 1)))
+
+        self.evaluation_board = self.generate_evaluation_board()
+        self.weight_masks = self.generate_weight_masks()
+        self.cell_weights = self.generate_cell_weights()
+        # Windows through every bit index: the shorter lines the evaluation
+        # counts and the winning lines
+        self.cell_pairs = self.cell_windows(connect - 2)
+        self.cell_triples = self.cell_windows(connect - 1)
+        self.cell_wins = self.cell_windows(connect)
+        # Bit of the mirror image of every bit index
+        self.mirrored_bits = [self.mirror(1 << index) for index in range(columns * self.column_height)]
+        if connect == 4:
+            # The search asks for threats at every node, so four in a row gets the unrolled version
+            self.winning_cells = self.four_winning_cells()
+
+    def __eq__(self, other):
+        return isinstance(other, Geometry) and self.shape() == other.shape()
+
+    def __hash__(self):
+        return hash(self.shape())
+
+    def __repr__(self):
+        return f"Geometry(rows={self.rows}, columns={self.columns}, connect={self.connect})"
+
+    def __reduce__(self):
+        # The unrolled winning_cells is a closure, so pickles carry the shape
+        # and the tables are built again, or shared with STANDARD, on loading
+        return geometry_for, self.shape()
+
+    def shape(self):
+        return self.rows, self.columns, self.connect
+
+    def cell_bit(self, row, col):
+        return 1 << (col * self.column_height + row)
+
+    def generate_evaluation_board(self):
+        if self.shape() == (ROWS, COLUMNS, CONNECT):
+            return EVALUATION_BOARD
+        board = [[0] * self.columns for _ in range(self.rows)]
+        for window in self.line_windows(self.connect):
+            for row in range(self.rows):
+                for col in range(self.columns):
+                    if window & self.cell_bit(row, col):
+                        board[row][col] += 1
+        return [[max(1, count // 2) for count in row] for row in board]
+
+    def generate_weight_masks(self):
+        """Group the cells of the evaluation board into one mask per distinct weight"""
+        masks = {}
+        for row in range(self.rows):
+            for col in range(self.columns):
+                weight = self.evaluation_board[row][col]
+                masks[weight] = masks.get(weight, 0) | self.cell_bit(row, col)
+        return tuple(masks.items())
+
+    def generate_cell_weights(self):
+        """Return the evaluation board weight of every bit index, 0 for guard bits"""
+        weights = [0] * (self.columns * self.column_height)
+        for row in range(self.rows):
+            for col in range(self.columns):
+                weights[col * self.column_height + row] = self.evaluation_board[row][col]
+        return weights
+
+    def line_windows(self, length):
+        """Return the mask of every window of length cells in a line on the board"""
+        windows = []
+        # (row step, column step) of each direction
+        for row_step, col_step in ((1, 0), (0, 1), (1, 1), (-1, 1)):
+            for row in range(self.rows):
+                for col in range(self.columns):
+                    end_row = row + row_step * (length - 1)
+                    end_col = col + col_step * (length - 1)
+                    if 0 <= end_row < self.rows and end_col < self.columns:
+                        windows.append(sum(self.cell_bit(row + row_step * i, col + col_step * i)
+                                           for i in range(length)))
+        return windows
+
+    def cell_windows(self, length):
+        """Map every bit index to the windows of length cells that pass through it"""
+        through_cell = [[] for _ in range(self.columns * self.column_height)]
+        for window in self.line_windows(length):
+            for index in range(self.columns * self.column_height):
+                if window >> index & 1:
+                    through_cell[index].append(window)
+        return [tuple(windows) for windows in through_cell]
+
+    def count_lines(self, mask, x_in_a_row):
+        """Count every x-in-a-row window fully covered by mask"""
+        count = 0
+        for shift in self.directions:
+            lines = mask
+            for i in range(1, x_in_a_row):
+                lines &= mask >> (i * shift)
+            count += lines.bit_count()
+        return count
+
+    def has_connect(self, mask):
+        """Check if mask contains connect in a row in any direction"""
+        connect = self.connect
+        for shift in self.directions:
+            # Double the run length until it covers half the line, then overlap two runs
+            lines = mask
+            length = 1
+            while 2 * length <= connect:
+                lines &= lines >> (length * shift)
+                length *= 2
+            if lines & (lines >> ((connect - length) * shift)):
+                return True
+        return False
+
+    def winning_cells(self, mask):
+        """Return the cells that would complete connect in a row for mask"""
+        needed = self.connect - 1
+        # Vertical: only the cell on top of a full stack can complete it
+        cells = mask << 1
+        for i in range(2, needed + 1):
+            cells &= mask << i
+
+        for shift in self.directions[1:]:
+            # runs_before[j]: j owned cells right before the cell, runs_after[j]: right after it
+            runs_before = [-1]
+            runs_after = [-1]
+            for i in range(1, needed + 1):
+                runs_before.append(runs_before[-1] & (mask << (i * shift)))
+                runs_after.append(runs_after[-1] & (mask >> (i * shift)))
+            for before in range(needed + 1):
+                cells |= runs_before[before] & runs_after[needed - before]
+
+        return cells & self.board_mask
+
+    def four_winning_cells(self):
+        """Return a winning_cells for connect 4 with the loops unrolled"""
+        _, horizontal, diagonal, anti_diagonal = self.directions
+        board_mask = self.board_mask
+
+        def winning_cells(mask):
+            # Vertical: only the cell on top of three stacked pieces can complete it
+            cells = (mask << 1) & (mask << 2) & (mask << 3)
+
+            for shift in (horizontal, diagonal, anti_diagonal):
+                pair = (mask << shift) & (mask << (2 * shift))
+                cells |= pair & (mask << (3 * shift))
+                cells |= pair & (mask >> shift)
+                pair = (mask >> shift) & (mask >> (2 * shift))
+                cells |= pair & (mask << shift)
+                cells |= pair & (mask >> (3 * shift))
+
+            return cells & board_mask
+
+        return winning_cells
+
+    def mirror(self, mask):
+        """Flip a mask or position key left to right"""
+        mirrored = 0
+        column_height, column_mask = self.column_height, self.column_mask
+        for col in range(self.columns):
+            column = (mask >> (col * column_height)) & column_mask
+            mirrored |= column << ((self.columns - 1 - col) * column_height)
+        return mirrored
+
+    def positional_score(self, mask):
+        """Sum the evaluation board over the cells covered by mask"""
+        return sum(weight * (mask & cells).bit_count() for weight, cells in self.weight_masks)
+
+
+# The standard game, used unless a position is given another geometry
+STANDARD = Geometry()
+
+
+def geometry_for(rows, columns, connect):
+    """Return the geometry of a board shape, STANDARD for the standard one"""
+    if (rows, columns, connect) == STANDARD.shape():
+        return STANDARD
+    return Geometry(rows, columns, connect)
+
+
+COLUMN_HEIGHT = STANDARD.column_height
+VERTICAL, HORIZONTAL, DIAGONAL, ANTI_DIAGONAL = DIRECTIONS = STANDARD.directions
+BOTTOM_MASK = STANDARD.bottom_mask
+BOARD_MASK = STANDARD.board_mask
+COLUMN_MASK = STANDARD.column_mask
+WEIGHT_MASKS = STANDARD.weight_masks
+CELL_WEIGHTS = STANDARD.cell_weights
+CELL_PAIRS = STANDARD.cell_pairs
+CELL_TRIPLES = STANDARD.cell_triples
+CELL_FOURS = STANDARD.cell_wins
+MIRRORED_BITS = STANDARD.mirrored_bits
+
+cell_bit = STANDARD.cell_bit
+count_lines = STANDARD.count_lines
+has_four = STANDARD.has_connect
+winning_cells = STANDARD.winning_cells
+mirror = STANDARD.mirror
+positional_score = STANDARD.positional_score
+
+
+class Position:
+    """A Connect Four board stored as one bitboard per player plus column heights
+
+    The positional sum and the number of 2- and 3-in-a-row lines of each player
+    are kept up to date as pieces are played. A placed piece can only complete
+    windows that pass through its own cell, so play() only looks at those and
+    the evaluation reads the totals instead of rescanning the board.
+
+    The search plays and undoes moves on one position instead of copying it,
+    so the columns played are kept on a preallocated move stack. The bitboards
+    of the mirror image are kept alongside, so the key of the mirrored
+    position costs no more than the key itself.
+    """
+
+    # Number of positions ever created, used to measure search allocations
+    allocations = 0
+
+    def __init__(self, geometry=STANDARD):
+        Position.allocations += 1
+        self.geometry = geometry
+        # Indexed by piece value, so bitboards[PLAYER] and bitboards[COMPUTER]
+        self.bitboards = [0, 0, 0]
+        self.mirrored_bitboards = [0, 0, 0]
+        self.heights = [0] * geometry.columns
+        self.moves = [0] * geometry.cells
+        self.num_moves = 0
+        # Pieces placed by from_array, which are not in the order they were played
+        self.setup_moves = 0
+        self.positional = [0, 0, 0]
+        self.pairs = [0, 0, 0]
+        self.triples = [0, 0, 0]
+
+    def copy(self):
+        position = Position(self.geometry)
+        position.bitboards = self.bitboards[:]
+        position.mirrored_bitboards = self.mirrored_bitboards[:]
+        position.heights = self.heights[:]
+        position.moves = self.moves[:]
+        position.num_moves = self.num_moves
+        position.setup_moves = self.setup_moves
+        position.positional = self.positional[:]
+        position.pairs = self.pairs[:]
+        position.triples = self.triples[:]
+        return position
+
+    @property
+    def occupied(self):
+        return self.bitboards[PLAYER] | self.bitboards[COMPUTER]
+
+    def can_play(self, col):
+        return 0 <= col < self.geometry.columns and self.heights[col] < self.geometry.rows
+
+    def valid_columns(self):
+        rows = self.geometry.rows
+        return [col for col, height in enumerate(self.heights) if height < rows]
+
+    def play(self, col, piece):
+        """Drop piece into col and return the row it landed in"""
+        geometry = self.geometry
+        row = self.heights[col]
+        index = col * geometry.column_height + row
+        mask = self.bitboards[piece] | (1 << index)
+        self.bitboards[piece] = mask
+        self.mirrored_bitboards[piece] |= geometry.mirrored_bits[index]
+        self.heights[col] = row + 1
+        self.moves[self.num_moves] = col
+        self.num_moves += 1
+
+        # Only windows through the new piece can have become complete
+        self.positional[piece] += geometry.cell_weights[index]
+        for window in geometry.cell_pairs[index]:
+            if mask & window == window:
+                self.pairs[piece] += 1
+        for window in geometry.cell_triples[index]:
+            if mask & window == window:
+                self.triples[piece] += 1
+        return row
+
+    def undo(self):
+        """Take back the last piece played, which must not be one placed by from_array"""
+        geometry = self.geometry
+        self.num_moves -= 1
+        col = self.moves[self.num_moves]
+        row = self.heights[col] - 1
+        index = col * geometry.column_height + row
+        bit = 1 << index
+        piece = PLAYER if self.bitboards[PLAYER] & bit else COMPUTER
+        mask = self.bitboards[piece]
+
+        # Remove the lines the piece completed before clearing it
+        self.positional[piece] -= geometry.cell_weights[index]
+        for window in geometry.cell_pairs[index]:
+            if mask & window == window:
+                self.pairs[piece] -= 1
+        for window in geometry.cell_triples[index]:
+            if mask & window == window:
+                self.triples[piece] -= 1
+
+        self.bitboards[piece] = mask ^ bit
+        self.mirrored_bitboards[piece] ^= geometry.mirrored_bits[index]
+        self.heights[col] = row
+
+    def key(self):
+        """Return a compact integer that uniquely identifies the board"""
+        # occupied + bottom mask marks the first empty cell of every column,
+        # which separates the player's pieces from the computer's
+        return self.bitboards[PLAYER] + self.occupied + self.geometry.bottom_mask
+
+    def mirrored_key(self):
+        """Return the key of the position flipped left to right"""
+        mirrored = self.mirrored_bitboards
+        return mirrored[PLAYER] + (mirrored[PLAYER] | mirrored[COMPUTER]) + self.geometry.bottom_mask
+
+    def canonical_key(self):
+        """Return (key, mirrored) where key is the smaller of the position's and its mirror's
+
+        A position and its mirror image share the canonical key. When mirrored
+        is True the key belongs to the mirror image, so columns stored under it
+        are flipped with columns - 1 - col.
+        """
+        key = self.key()
+        mirrored_key = self.mirrored_key()
+        if mirrored_key < key:
+            return mirrored_key, True
+        return key, False
+
+    def is_full(self):
+        return self.num_moves == self.geometry.cells
+
+    def is_win(self, piece):
+        return self.geometry.has_connect(self.bitboards[piece])
+
+    def last_move_wins(self):
+        """Check if the last piece played completed a winning line"""
+        if self.num_moves <= self.setup_moves:
+            # The last piece placed by from_array is unknown, but a game
+            # ends with its first line, so any line was completed last
+            return self.is_win(PLAYER) or self.is_win(COMPUTER)
+        # Only the lines through the last piece can have been completed by it
+        col = self.moves[self.num_moves - 1]
+        index = col * self.geometry.column_height + self.heights[col] - 1
+        mask = self.bitboards[PLAYER]
+        if not mask >> index & 1:
+            mask = self.bitboards[COMPUTER]
+        for window in self.geometry.cell_wins[index]:
+            if mask & window == window:
+                return True
+        return False
+
+    def last_piece(self):
+        """Return the piece played last, or EMPTY when it is not known"""
+        if not self.num_moves:
+            return EMPTY
+        if self.num_moves <= self.setup_moves:
+            # Of pieces placed by from_array only a winning line tells which came last
+            if self.is_win(PLAYER):
+                return PLAYER
+            return COMPUTER if self.is_win(COMPUTER) else EMPTY
+        col = self.moves[self.num_moves - 1]
+        return self.get(self.heights[col] - 1, col)
+
+    def playable_cells(self):
+        """Return the cells a piece would land in for every non-full column"""
+        geometry = self.geometry
+        return (self.occupied + geometry.bottom_mask) & geometry.board_mask
+
+    def threat_cells(self, piece):
+        """Return the playable cells where piece would complete a winning line right away"""
+        return self.geometry.winning_cells(self.bitboards[piece]) & self.playable_cells()
+
+    def has_possible_four(self, piece):
+        """Check to see if next move would lead to a winning line"""
+        return bool(self.threat_cells(piece))
+
+    def count_lines(self, piece, x_in_a_row):
+        return self.geometry.count_lines(self.bitboards[piece], x_in_a_row)
+
+    def positional_score(self, piece):
+        return self.geometry.positional_score(self.bitboards[piece])
+
+    def get(self, row, col):
+        bit = self.geometry.cell_bit(row, col)
+        if self.bitboards[PLAYER] & bit:
+            return PLAYER
+        if self.bitboards[COMPUTER] & bit:
+            return COMPUTER
+        return EMPTY
+
+    def to_array(self):
+        """Return the position as a rows x columns numpy array, row 0 at the bottom"""
+        import numpy as np
+
+        board = np.zeros((self.geometry.rows, self.geometry.columns), dtype=int)
+        for row in range(self.geometry.rows):
+            for col in range(self.geometry.columns):
+                board[row][col] = self.get(row, col)
+        return board
+
+    @classmethod
+    def from_array(cls, board, geometry=STANDARD):
+        """Build a position from a rows x columns array, row 0 at the bottom
+
+        The array does not say in which order the pieces were played, so they
+        cannot be taken back with undo, and last_move_wins and last_piece only
+        look for a winning line. Moves played on the position work as usual.
+        """
+        position = cls(geometry)
+        for col in range(geometry.columns):
+            for row in range(geometry.rows):
+                if board[row][col] == EMPTY:
+                    break
+                position.play(col, int(board[row][col]))
+        position.setup_moves = position.num_moves
+        return position
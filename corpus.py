@@ -0,0 +1,135 @@
+"""
+Fixed corpus of benchmark positions.
+
+Every position is a legal, unfinished game reached by alternating moves from
+the empty board, player first, and is stored as the string of columns played
+(0-6). Neither side can win on the next move, so no position is settled by
+the threat pre-pass without a search. Positions are stratified by the number
+of pieces on the board and grouped into game phases, so every phase gets the
+same number of positions per ply. The corpus file starts with its version and
+the seed it was generated from; benchmarks load that file instead of
+generating positions, so the same positions are searched on every machine and
+build.
+
+Run this file to regenerate the corpus:
+
+    python3 corpus.py --seed 483 --per-ply 2
+"""
+import os
+import random
+
+from bitboard import Position, PLAYER, COMPUTER
+
+CORPUS_VERSION = 2
+
+# (phase, first ply, last ply) by number of pieces on the board
+PHASES = (
+    ('opening', 4, 10),
+    ('middlegame', 11, 24),
+    ('endgame', 25, 34),
+)
+
+DEFAULT_CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_corpus.txt')
+
+
+def position_from_moves(moves):
+    """Replay a string of columns from the empty board, player first"""
+    position = Position()
+    piece = PLAYER
+    for move in moves:
+        position.play(int(move), piece)
+        piece = COMPUTER if piece == PLAYER else PLAYER
+    return position
+
+
+def side_to_move(position):
+    return PLAYER if position.num_moves % 2 == 0 else COMPUTER
+
+
+def random_game(rng, plies):
+    """Return the moves of a random unfinished game of plies moves, or None if it ended early"""
+    position = Position()
+    piece = PLAYER
+    moves = []
+    for _ in range(plies):
+        # Only moves that do not win, so the game is still going at the end
+        quiet_moves = []
+        for col in position.valid_columns():
+            position.play(col, piece)
+            if not position.last_move_wins():
+                quiet_moves.append(col)
+            position.undo()
+        if not quiet_moves:
+            return None
+        col = rng.choice(quiet_moves)
+        position.play(col, piece)
+        moves.append(str(col))
+        piece = COMPUTER if piece == PLAYER else PLAYER
+    return ''.join(moves)
+
+
+def generate_corpus(seed=483, per_ply=2):
+    """Return [(phase, moves)] with per_ply distinct positions for every ply of every phase"""
+    rng = random.Random(seed)
+    corpus = []
+    # Different move orders can reach the same position, keep it once
+    seen = set()
+    for phase, first_ply, last_ply in PHASES:
+        for ply in range(first_ply, last_ply + 1):
+            found = 0
+            while found < per_ply:
+                moves = random_game(rng, ply)
+                if moves is None:
+                    continue
+                position = position_from_moves(moves)
+                # A win on the board would be played or blocked at the root in one node
+                if position.threat_cells(PLAYER) or position.threat_cells(COMPUTER):
+                    continue
+                key = position.key()
+                if key not in seen:
+                    seen.add(key)
+                    corpus.append((phase, moves))
+                    found += 1
+    return corpus
+
+
+def save_corpus(corpus, path=DEFAULT_CORPUS_PATH, seed=483):
+    with open(path, 'w') as corpus_file:
+        corpus_file.write(f"# connect four benchmark corpus version {CORPUS_VERSION} seed {seed}\n")
+        for phase, moves in corpus:
+            corpus_file.write(f"{phase} {len(moves)} {moves}\n")
+
+
+def load_corpus(path=DEFAULT_CORPUS_PATH):
+    """Return the [(phase, moves)] of a corpus file, checking its version"""
+    with open(path) as corpus_file:
+        header = corpus_file.readline().split()
+        if header[:6] != ['#', 'connect', 'four', 'benchmark', 'corpus', 'version']:
+            raise ValueError(f"{path} is not a benchmark corpus")
+        if int(header[6]) != CORPUS_VERSION:
+            raise ValueError(f"{path} is corpus version {header[6]}, expected {CORPUS_VERSION}")
+
+        corpus = []
+        for line in corpus_file:
+            phase, ply, moves = line.split()
+            if len(moves) != int(ply):
+                raise ValueError(f"Corrupt corpus line: {line.strip()}")
+            corpus.append((phase, moves))
+    return corpus
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate the benchmark position corpus")
+    parser.add_argument('--seed', type=int, default=483,
+                        help="seed of the random games")
+    parser.add_argument('--per-ply', type=int, default=2,
+                        help="number of positions for every ply of every phase")
+    parser.add_argument('--output', default=DEFAULT_CORPUS_PATH,
+                        help="path of the corpus file to write")
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.seed, args.per_ply)
+    save_corpus(corpus, args.output, args.seed)
+    print(f"Wrote {len(corpus)} positions to {args.output}")
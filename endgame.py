@@ -0,0 +1,172 @@
+"""
+Exact endgame solver.
+
+Near the end of a game the tree left is small enough to search to the end, so
+the solver plays every line out instead of stopping at a heuristic horizon.
+Scores are from the side to move's point of view:
+
+    win:  the number of empty cells left when the game ends, plus one
+    draw: 0
+    loss: minus the same count for the opponent's win
+
+so a quicker win (or a slower loss) always scores higher. The exact score is
+found with a series of null-window negamax probes that bisect the score range,
+each of which only has to prove a bound and prunes far more than a full window.
+The solver works on the standard 6 x 7 board; engines on other geometries
+always use the heuristic search.
+"""
+from bitboard import (ROWS, COLUMNS, PLAYER, COMPUTER, COLUMN_HEIGHT, BOTTOM_MASK,
+                      BOARD_MASK, COLUMN_MASK, winning_cells)
+from move_ordering import CENTER_ORDER
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+# How many nodes to search between two calls of the stop check
+CHECK_INTERVAL = 4096
+
+# Mask of every cell of a column, in CENTER_ORDER
+CENTER_COLUMNS = [(col, (COLUMN_MASK >> 1) << (col * COLUMN_HEIGHT)) for col in CENTER_ORDER]
+
+
+def opponent_of(piece):
+    return COMPUTER if piece == PLAYER else PLAYER
+
+
+class EndgameSolver:
+    """Negamax solver with a transposition table of proven bounds"""
+
+    def __init__(self, table_size=None):
+        self.table = TranspositionTable(table_size) if table_size else TranspositionTable()
+        self.nodes = 0
+        self.check = None
+
+    def solve(self, position, piece, check=None):
+        """Return the exact score of position with piece to move
+
+        check is called every CHECK_INTERVAL nodes and may raise to abort.
+        """
+        self.nodes = 0
+        self.check = check
+        current = position.bitboards[piece]
+        occupied = position.occupied
+        empty = ROWS * COLUMNS - position.num_moves
+
+        if winning_cells(current) & self.playable(occupied):
+            return empty
+
+        # Bisect the score range, probing close to 0 first since most
+        # endgames are decided by a small margin
+        low, high = -empty, empty
+        while low < high:
+            middle = low + (high - low) // 2
+            if middle <= 0 and low // 2 < middle:
+                middle = low // 2
+            elif middle >= 0 and high // 2 > middle:
+                middle = high // 2
+            score = self.negamax(current, occupied, empty, middle, middle + 1)
+            if score <= middle:
+                high = score
+            else:
+                low = score
+        return low
+
+    def best_move(self, position, piece, check=None):
+        """Return (column, score) of a move that reaches the exact score"""
+        score = self.solve(position, piece, check)
+        current = position.bitboards[piece]
+        occupied = position.occupied
+        empty = ROWS * COLUMNS - position.num_moves
+        playable = self.playable(occupied)
+
+        winning = winning_cells(current) & playable
+        if winning:
+            col = (winning.bit_length() - 1) // COLUMN_HEIGHT
+            return col, score
+
+        best_column = None
+        for col, column_cells in CENTER_COLUMNS:
+            move = playable & column_cells
+            if not move:
+                continue
+            if best_column is None:
+                best_column = col
+            opponent = current ^ occupied
+            if winning_cells(opponent) & self.playable(occupied | move):
+                child = -(empty - 1)
+            else:
+                # A null window just below the score proves whether the move reaches it
+                child = -self.negamax(opponent, occupied | move, empty - 1, -score, -score + 1)
+            if child >= score:
+                best_column = col
+                break
+        return best_column, score
+
+    def playable(self, occupied):
+        return (occupied + BOTTOM_MASK) & BOARD_MASK
+
+    def negamax(self, current, occupied, empty, alpha, beta):
+        """Score of the side to move (current) that is exact inside (alpha, beta)
+
+        The side to move is known not to have a winning move here.
+        """
+        self.nodes += 1
+        if self.check is not None and self.nodes % CHECK_INTERVAL == 0:
+            self.check()
+
+        opponent = current ^ occupied
+        playable = self.playable(occupied)
+        threats = winning_cells(opponent) & ~occupied
+        forced = playable & threats
+        if forced:
+            # Two cells to block at once cannot both be blocked
+            if forced & (forced - 1):
+                return -(empty - 1)
+            moves = forced
+        else:
+            moves = playable
+        # Filling the cell under an opponent threat lets the opponent win there
+        moves &= ~(threats >> 1)
+        if not moves:
+            return -(empty - 1)
+        if empty <= 2:
+            return 0
+
+        # The opponent cannot win on its next move any more, and this side
+        # cannot win before its next move either
+        alpha = max(alpha, -(empty - 3))
+        beta = min(beta, empty - 2)
+        if alpha >= beta:
+            return alpha
+
+        key = current + occupied
+        entry = self.table.probe(key)
+        if entry is not None:
+            _, score, bound, _ = entry
+            if bound == EXACT:
+                return score
+            if bound == LOWER_BOUND:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return score
+
+        # Try the moves that leave the most new threats first, center first on ties
+        scored = []
+        for col, column_cells in CENTER_COLUMNS:
+            move = moves & column_cells
+            if move:
+                new_threats = winning_cells(current | move) & ~(occupied | move)
+                scored.append((-new_threats.bit_count(), len(scored), move))
+        scored.sort()
+
+        alpha_original = alpha
+        for _, _, move in scored:
+            score = -self.negamax(opponent, occupied | move, empty - 1, -beta, -alpha)
+            if score >= beta:
+                self.table.store(key, empty, score, LOWER_BOUND, None)
+                return score
+            if score > alpha:
+                alpha = score
+
+        self.table.store(key, empty, alpha, UPPER_BOUND if alpha == alpha_original else EXACT, None)
+        return alpha
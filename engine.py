@@ -0,0 +1,576 @@
+"""
+Connect Four game logic and AI search, independent of the user interface.
+
+Engine holds the position and everything the computer needs to choose a move:
+move generation, evaluation, the alpha-beta search with its transposition
+table and move ordering, and the endgame solver. Nothing here imports tkinter
+or numpy, so the engine loads quickly in the game, the performance tests and
+in worker processes.
+"""
+import random
+import time
+import threading
+from bitboard import Position, STANDARD, PLAYER, COMPUTER, EMPTY
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+from move_ordering import MoveOrderer
+from endgame import EndgameSolver
+from search_stats import SearchStats
+
+# How many nodes to search between two clock reads
+BUDGET_CHECK_INTERVAL = 256
+
+# Solve the game exactly once this few cells are left empty, None to never solve
+ENDGAME_EMPTY_CELLS = 20
+
+# Scores at least this far from 0 are wins or losses the search has proven
+PROVEN_SCORE = 1000000
+
+# Half width of the aspiration window around the score of an earlier iteration
+ASPIRATION_WINDOW = 50
+
+# Nodes with at least this many plies left are looked up in and stored to the
+# persistent search cache, shallower ones are cheaper to search than to store
+CACHE_MIN_DEPTH = 4
+
+# Root searches iterative_deepening can run
+SEARCH_ALGORITHMS = ('minimax', 'negamax')
+
+# Weights of the line counts and threats in score_position, positive terms
+# favour the player and negative ones the computer
+DEFAULT_WEIGHTS = {
+    'computer_triples': 100,
+    'computer_pairs': 10,
+    'player_triples': 80,
+    'player_pairs': 8,
+    'player_threat': 20000,
+    'computer_threat': 10000,
+}
+
+class SearchTimeout(Exception):
+    """Raised inside minimax when the budget of a search runs out or it is cancelled"""
+
+class Engine:
+    """Position and AI search of a Connect Four game, without any window"""
+
+    def __init__(self, board=None, weights=None, geometry=None):
+        # The board decides the geometry when one is given, otherwise it is
+        # the given geometry or the standard game
+        if board is None:
+            board = Position(geometry or STANDARD)
+        self.board = board
+        self.geometry = board.geometry
+        self.set_weights(weights)
+        self.init_search_state()
+
+    def set_weights(self, weights=None):
+        """Use DEFAULT_WEIGHTS in score_position, overridden by the given weights"""
+        unknown = set(weights or {}) - set(DEFAULT_WEIGHTS)
+        if unknown:
+            raise ValueError(f"Unknown evaluation weights: {', '.join(sorted(unknown))}")
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+
+    def init_search_state(self):
+        """Set up the state used by the AI search"""
+        self.transposition_table = TranspositionTable()
+        self.move_orderer = MoveOrderer(geometry=self.geometry)
+        self.nodes = 0
+        self.search_deadline = None
+        self.node_limit = None
+        self.budget_armed = False
+        self.completed_depth = 0
+        self.search_cancelled = threading.Event()
+        self.endgame_solver = EndgameSolver()
+        # The solver only knows the standard board
+        self.endgame_threshold = ENDGAME_EMPTY_CELLS if self.geometry == STANDARD else None
+        # Store a position and its mirror image under one transposition table key
+        self.mirror_keys = True
+        # Settle immediate wins, forced blocks and double threats before expanding a node
+        self.threat_pass = True
+        # Negamax with principal variation search and aspiration windows, or the plain minimax
+        self.algorithm = 'negamax'
+        # Persistent SearchCache backing the transposition table, None to search without one
+        self.search_cache = None
+        # Set while a depth-capped level searches, which must not take deeper
+        # results from the cache, like it does not use the book or the solver
+        self.depth_capped = False
+        # Statistics collector, None unless enable_stats() was called
+        self.stats = None
+
+    def enable_stats(self):
+        """Collect search statistics from now on and return the collector"""
+        if self.stats is None:
+            self.stats = SearchStats()
+            self.stats.attach(self)
+        return self.stats
+
+    def disable_stats(self):
+        if self.stats is not None:
+            self.stats.detach()
+            self.stats = None
+
+    def is_valid_move(self, col):
+        return self.board.can_play(col)
+
+    def get_next_row(self, col):
+        return self.next_free_row(col, self.board)
+
+    def check_winner(self, player):
+        return self.board.is_win(player)
+
+    def is_board_full(self):
+        return self.board.is_full()
+
+    def get_valid_columns(self, board):
+        return board.valid_columns()
+
+    def next_free_row(self, col, board):
+        return board.heights[col] if board.can_play(col) else -1
+
+    def place_piece(self, row, col, player, board):
+        board.play(col, player)
+
+    def board_full(self, board):
+        return board.is_full()
+    
+    def count_lines(self, board, piece, x_in_a_row):
+        return board.count_lines(piece, x_in_a_row)
+    
+    """ Check to see if next move would lead to a 4-in-a-row """
+    def has_possible_four(self, board, piece):
+        return board.has_possible_four(piece)
+        
+    def score_position(self, board):
+        weights = self.weights
+        score = 0
+
+        # Calculate the scores of the computer based on position on board
+        score -= board.positional[COMPUTER]
+        score += board.positional[PLAYER]
+        
+        # Calculate points for current piece (COMPUTER) based number of lines
+        score -= board.triples[COMPUTER] * weights['computer_triples']
+        score -= board.pairs[COMPUTER] * weights['computer_pairs']
+
+        # Recalculate points based on opponent's number of lines
+        score += board.triples[PLAYER] * weights['player_triples']
+        score += board.pairs[PLAYER] * weights['player_pairs']
+
+        # If opponent has a possible 4-in-a-row, prioritize stopping it
+        if (self.has_possible_four(board, PLAYER) == True):
+            score += weights['player_threat']
+        if (self.has_possible_four(board, COMPUTER) == True):
+            score -= weights['computer_threat']
+
+        return score
+
+    def is_end_of_game(self, board):
+        # A game ends on the move that wins it, so only the last move can have won
+        return board.last_move_wins() or self.board_full(board)
+
+    def winner(self, board):
+        """Return the piece that won on the last move, or EMPTY"""
+        return board.last_piece() if board.last_move_wins() else EMPTY
+
+    def check_budget(self):
+        if self.search_cancelled.is_set():
+            raise SearchTimeout()
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise SearchTimeout()
+        if (self.search_deadline is not None and self.nodes % BUDGET_CHECK_INTERVAL == 0
+                and time.perf_counter() > self.search_deadline):
+            raise SearchTimeout()
+
+    def iterative_deepening(self, board, max_depth=None, time_budget=None, node_budget=None, max_player=False):
+        """Search one ply deeper at a time until the depth, time or node budget runs out"""
+        # A timeout leaves moves played on the searched board, so search a copy
+        board = board.copy()
+        empty_cells = board.geometry.cells - board.num_moves
+        if self.use_endgame_solver(board, max_depth):
+            return self.solve_endgame(board, max_player)
+        self.depth_capped = max_depth is not None
+        max_depth = empty_cells if max_depth is None else min(max_depth, empty_cells)
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+
+        valid_locations = self.get_valid_columns(board)
+        best_column = valid_locations[0] if valid_locations else None
+        best_value = None
+        self.nodes = 0
+        self.completed_depth = 0
+        if self.stats is not None:
+            self.stats.reset()
+
+        # Scores of the completed iterations, the aspiration guess comes from here
+        values = []
+        for depth in range(1, max_depth + 1):
+            # The first iteration always runs to completion so there is a move to play
+            if self.completed_depth:
+                if self.search_cancelled.is_set():
+                    break
+                self.search_deadline = deadline
+                self.node_limit = node_budget
+                self.budget_armed = True
+
+            iteration_start = self.nodes
+            try:
+                # Searching the previous best move first tightens the window early
+                first_move = best_column if self.completed_depth else None
+                if self.algorithm == 'negamax':
+                    # The side that moves last at the horizon swings the score,
+                    # so the iteration two plies shallower is the better guess
+                    guess = values[-2] if len(values) >= 2 else None
+                    column, value = self.aspiration_search(board, depth, guess, max_player, first_move)
+                else:
+                    column, value = self.minimax(board, depth, -float('inf'), float('inf'), max_player,
+                                                 first_move=first_move)
+            except SearchTimeout:
+                break
+            finally:
+                self.search_deadline = None
+                self.node_limit = None
+                self.budget_armed = False
+
+            best_column, best_value = column, value
+            values.append(value)
+            self.completed_depth = depth
+            if self.stats is not None:
+                self.stats.record_iteration(self.nodes - iteration_start)
+
+            # A root settled by the threat pass or a proven win or loss does
+            # not change however deep the search goes
+            if abs(value) >= PROVEN_SCORE:
+                break
+
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+
+        if self.search_cache is not None:
+            self.search_cache.flush()
+        return best_column, best_value
+
+    def aspiration_search(self, board, depth, guess, max_player, first_move=None):
+        """Negamax the root in a narrow window around guess, widening the side it fails on
+
+        Takes and returns scores from the player's point of view, like minimax.
+        """
+        color = 1 if max_player else -1
+        if guess is None:
+            alpha, beta = -float('inf'), float('inf')
+        else:
+            alpha, beta = color * guess - ASPIRATION_WINDOW, color * guess + ASPIRATION_WINDOW
+
+        while True:
+            column, score = self.negamax(board, depth, alpha, beta, color, first_move)
+            if score <= alpha and alpha != -float('inf'):
+                alpha = -float('inf')
+            elif score >= beta and beta != float('inf'):
+                beta = float('inf')
+            else:
+                return column, color * score
+
+    def use_endgame_solver(self, board, max_depth):
+        """Check if board is close enough to the end to be solved instead of searched"""
+        empty_cells = board.geometry.cells - board.num_moves
+        if self.endgame_threshold is None or empty_cells > self.endgame_threshold or board.geometry != STANDARD:
+            return False
+        # Depth-capped levels only get the exact result when their search would reach the end
+        if max_depth is not None and max_depth < empty_cells:
+            return False
+        return not (board.is_full() or board.is_win(PLAYER) or board.is_win(COMPUTER))
+
+    def check_cancelled(self):
+        if self.search_cancelled.is_set():
+            raise SearchTimeout()
+
+    def solve_endgame(self, board, max_player):
+        """Return the solver's move and its result on the minimax score scale"""
+        piece = PLAYER if max_player else COMPUTER
+        self.nodes = 0
+        self.completed_depth = 0
+        try:
+            column, score = self.endgame_solver.best_move(board, piece, check=self.check_cancelled)
+        except SearchTimeout:
+            return self.get_valid_columns(board)[0], None
+        self.nodes = self.endgame_solver.nodes
+        self.completed_depth = board.geometry.cells - board.num_moves
+
+        if score == 0:
+            return column, 0
+        # The solver scores quicker wins higher, keep that on top of the win score
+        if (score > 0) == max_player:
+            return column, 1000000 + 5000 + abs(score)
+        return column, -1000000 - abs(score)
+
+    def threats(self, board, max_player):
+        """Settle a node from the immediate threats of both sides
+
+        Returns None when no move is forced, (winning column, win score) when
+        the side to move can win right away, (column, loss score) when the
+        opponent has two threats that cannot both be blocked, and (blocking
+        column, None) when exactly one threat has to be blocked.
+        """
+        piece, opponent = (PLAYER, COMPUTER) if max_player else (COMPUTER, PLAYER)
+        column_height = board.geometry.column_height
+        wins = board.threat_cells(piece)
+        if wins:
+            # Nothing scores better than winning right away
+            return (wins.bit_length() - 1) // column_height, 1000000 + 5000 if max_player else -1000000
+        blocks = board.threat_cells(opponent)
+        if not blocks:
+            return None
+        column = (blocks.bit_length() - 1) // column_height
+        if blocks & (blocks - 1):
+            # Only one of two threats can be blocked, the opponent wins next move
+            return column, -1000000 if max_player else 1000000 + 5000
+        # Any other move lets the opponent win, so only the block is searched
+        return column, None
+
+    def leaf_value(self, board, is_terminal):
+        if is_terminal:
+            winner = self.winner(board)
+            if winner == COMPUTER:
+                return -1000000
+            elif winner == PLAYER:
+                return 1000000 + 5000
+            else:  # Game is over, no more valid moves
+                return 0
+        else:  # Depth is zero
+            return self.score_position(board)
+
+    def score_leaf(self, board):
+        """Score a node at the horizon without the overhead of a minimax call"""
+        self.nodes += 1
+        return self.leaf_value(board, self.is_end_of_game(board))
+
+    def minimax(self, board, depth, alpha, beta, max_player, first_move=None):
+        self.nodes += 1
+        if self.budget_armed:
+            self.check_budget()
+
+        valid_locations = self.get_valid_columns(board)
+        is_terminal = self.is_end_of_game(board)
+
+        if depth == 0 or is_terminal:
+            return (None, self.leaf_value(board, is_terminal))
+
+        if self.threat_pass:
+            forced = self.threats(board, max_player)
+            if forced is not None:
+                column, value = forced
+                if value is not None:
+                    return column, value
+                valid_locations = [column]
+
+        # Reuse or narrow the window with what was learned in a transposition
+        table = self.transposition_table
+        tt_move = None
+        if table is not None:
+            if self.mirror_keys:
+                key, mirrored = board.canonical_key()
+            else:
+                key, mirrored = board.key(), False
+            key = key * 2 + max_player
+            alpha_original, beta_original = alpha, beta
+            entry = table.probe(key)
+            # Earlier iterations leave shallow entries, a deeper one may be on disk
+            if self.search_cache is not None and depth >= CACHE_MIN_DEPTH and (entry is None or entry[0] < depth):
+                cached = self.search_cache.probe(key)
+                if (cached is not None and (entry is None or cached[0] > entry[0])
+                        and not (self.depth_capped and cached[0] > depth)):
+                    entry = cached
+                    table.store(key, *entry)
+            if entry is not None:
+                entry_depth, entry_score, bound, entry_move = entry
+                # Moves are stored as played in the canonical position
+                if mirrored:
+                    entry_move = board.geometry.columns - 1 - entry_move
+                tt_move = entry_move
+                if entry_depth >= depth:
+                    if bound == EXACT:
+                        return entry_move, entry_score
+                    if bound == LOWER_BOUND:
+                        alpha = max(alpha, entry_score)
+                    else:
+                        beta = min(beta, entry_score)
+                    if alpha >= beta:
+                        return entry_move, entry_score
+
+        ply = board.num_moves
+        orderer = self.move_orderer
+        if orderer is not None:
+            valid_locations = orderer.order(valid_locations, ply, max_player, tt_move)
+        if first_move in valid_locations:
+            valid_locations.remove(first_move)
+            valid_locations.insert(0, first_move)
+
+        # Maximize computer
+        if max_player:
+            value = -float('inf')
+            column = random.choice(valid_locations) if valid_locations else None
+
+            for index, col in enumerate(valid_locations):
+                board.play(col, PLAYER)
+
+                # Calculate a score based on the position of the dropped piece
+                if depth == 1:
+                    new_score = self.score_leaf(board)
+                else:
+                    new_score = self.minimax(board, depth-1, alpha, beta, False)[1]
+                board.undo()
+
+                if new_score > value:
+                    value = new_score
+                    column = col
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    if orderer is not None:
+                        orderer.record_cutoff(col, ply, max_player, depth, index)
+                    break
+        
+        else:  # Minimizing player
+            value = float('inf')
+            column = random.choice(valid_locations) if valid_locations else None
+
+            for index, col in enumerate(valid_locations):
+                board.play(col, COMPUTER)
+
+                # Calculate a score based on the position of the dropped piece
+                if depth == 1:
+                    new_score = self.score_leaf(board)
+                else:
+                    new_score = self.minimax(board, depth-1, alpha, beta, True)[1]
+                board.undo()
+
+                if new_score < value:
+                    value = new_score
+                    column = col
+                beta = min(beta, value)
+                if alpha >= beta:
+                    if orderer is not None:
+                        orderer.record_cutoff(col, ply, max_player, depth, index)
+                    break
+
+        if table is not None:
+            if value <= alpha_original:
+                bound = UPPER_BOUND
+            elif value >= beta_original:
+                bound = LOWER_BOUND
+            else:
+                bound = EXACT
+            move = board.geometry.columns - 1 - column if mirrored else column
+            table.store(key, depth, value, bound, move)
+            if self.search_cache is not None and depth >= CACHE_MIN_DEPTH:
+                self.search_cache.store(key, depth, value, bound, move)
+
+        return column, value
+
+    def negamax(self, board, depth, alpha, beta, color, first_move=None):
+        """Search board for the side to move, color 1 for the player and -1 for the computer
+
+        Scores are from the point of view of the side to move. The first move
+        gets the full window and every other move a null window, which is only
+        widened when the move turns out to be better than the first one.
+        Table entries are stored from the player's point of view, the same way
+        minimax stores them.
+        """
+        self.nodes += 1
+        if self.budget_armed:
+            self.check_budget()
+
+        is_terminal = self.is_end_of_game(board)
+        if depth == 0 or is_terminal:
+            return None, color * self.leaf_value(board, is_terminal)
+
+        max_player = color == 1
+        valid_locations = board.valid_columns()
+        if self.threat_pass:
+            forced = self.threats(board, max_player)
+            if forced is not None:
+                column, value = forced
+                if value is not None:
+                    return column, color * value
+                valid_locations = [column]
+
+        table = self.transposition_table
+        tt_move = None
+        if table is not None:
+            if self.mirror_keys:
+                key, mirrored = board.canonical_key()
+            else:
+                key, mirrored = board.key(), False
+            key = key * 2 + max_player
+            alpha_original, beta_original = alpha, beta
+            entry = table.probe(key)
+            # Earlier iterations leave shallow entries, a deeper one may be on disk
+            if self.search_cache is not None and depth >= CACHE_MIN_DEPTH and (entry is None or entry[0] < depth):
+                cached = self.search_cache.probe(key)
+                if (cached is not None and (entry is None or cached[0] > entry[0])
+                        and not (self.depth_capped and cached[0] > depth)):
+                    entry = cached
+                    table.store(key, *entry)
+            if entry is not None:
+                entry_depth, entry_score, bound, entry_move = entry
+                if mirrored:
+                    entry_move = board.geometry.columns - 1 - entry_move
+                tt_move = entry_move
+                if entry_depth >= depth:
+                    score = color * entry_score
+                    # A bound on the player's score is the opposite bound for the computer
+                    if color == -1 and bound != EXACT:
+                        bound = UPPER_BOUND if bound == LOWER_BOUND else LOWER_BOUND
+                    if bound == EXACT:
+                        return entry_move, score
+                    if bound == LOWER_BOUND:
+                        alpha = max(alpha, score)
+                    else:
+                        beta = min(beta, score)
+                    if alpha >= beta:
+                        return entry_move, score
+
+        ply = board.num_moves
+        orderer = self.move_orderer
+        if orderer is not None:
+            valid_locations = orderer.order(valid_locations, ply, max_player, tt_move)
+        if first_move in valid_locations:
+            valid_locations.remove(first_move)
+            valid_locations.insert(0, first_move)
+
+        piece = PLAYER if max_player else COMPUTER
+        value = -float('inf')
+        column = valid_locations[0]
+        for index, col in enumerate(valid_locations):
+            board.play(col, piece)
+            if depth == 1:
+                score = color * self.score_leaf(board)
+            elif index == 0:
+                score = -self.negamax(board, depth - 1, -beta, -alpha, -color)[1]
+            else:
+                # Prove the move is no better than the best so far with a null window
+                score = -self.negamax(board, depth - 1, -alpha - 1, -alpha, -color)[1]
+                if alpha < score < beta:
+                    score = -self.negamax(board, depth - 1, -beta, -score, -color)[1]
+            board.undo()
+
+            if score > value:
+                value = score
+                column = col
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                if orderer is not None:
+                    orderer.record_cutoff(col, ply, max_player, depth, index)
+                break
+
+        if table is not None:
+            if value <= alpha_original:
+                bound = UPPER_BOUND
+            elif value >= beta_original:
+                bound = LOWER_BOUND
+            else:
+                bound = EXACT
+            if color == -1 and bound != EXACT:
+                bound = UPPER_BOUND if bound == LOWER_BOUND else LOWER_BOUND
+            move = board.geometry.columns - 1 - column if mirrored else column
+            table.store(key, depth, color * value, bound, move)
+            if self.search_cache is not None and depth >= CACHE_MIN_DEPTH:
+                self.search_cache.store(key, depth, color * value, bound, move)
+
+        return column, value
@@ -0,0 +1,160 @@
+"""
+Load generator for the game server.
+
+Opens a number of connections to a running server.py, plays many games at
+once on each of them with random moves until the time is up, and reports the
+computer moves served per second and the latency of a move request, from
+sending the client's move to receiving the computer's answer:
+
+    python3 server.py --workers 4 &
+    python3 load_client.py --connections 10 --sessions 50 --duration 30
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+
+from bitboard import Position, PLAYER, COMPUTER
+from performance_test import percentile
+from server import DEFAULT_PORT
+
+
+class Connection:
+    """One connection to the server with any number of requests waiting for their answer"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.request_ids = itertools.count(1)
+        self.waiting = {}
+        self.receiver = asyncio.create_task(self.receive())
+
+    async def receive(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self.waiting.pop(response.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self.waiting.values():
+            future.set_exception(ConnectionError("the server closed the connection"))
+
+    async def request(self, **request):
+        request['id'] = next(self.request_ids)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[request['id']] = future
+        self.writer.write((json.dumps(request) + '\n').encode())
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        self.receiver.cancel()
+
+
+async def play_games(connection, end_time, config, deadline, results):
+    """Play random games on connection until end_time"""
+    limits = {} if deadline is None else {'deadline': deadline}
+    while time.perf_counter() < end_time:
+        first = random.choice(('player', 'computer'))
+        request = {'op': 'new', 'first': first}
+        if config is not None:
+            request['config'] = config
+        response = await connection.request(**request, **limits)
+        if not response['ok']:
+            results['errors'][response['code']] += 1
+            await asyncio.sleep(0.1)
+            continue
+        session = response['session']
+
+        position = Position()
+        for move in response['moves']:
+            position.play(int(move), PLAYER if position.num_moves % 2 == 0 else COMPUTER)
+        result = response['result']
+        while result is None and time.perf_counter() < end_time:
+            column = random.choice(position.valid_columns())
+            start_time = time.perf_counter()
+            response = await connection.request(op='move', session=session, column=column, **limits)
+            if not response['ok']:
+                results['errors'][response['code']] += 1
+                # A refused move was taken back, so it is simply sent again
+                await asyncio.sleep(0.1)
+                continue
+            results['latencies'].append(time.perf_counter() - start_time)
+            for move in response['moves'][position.num_moves:]:
+                position.play(int(move), PLAYER if position.num_moves % 2 == 0 else COMPUTER)
+            result = response['result']
+            if 'computer_move' in response:
+                results['moves'] += 1
+
+        if result is not None:
+            results['games'] += 1
+        await connection.request(op='close', session=session)
+
+
+async def run_load(host, port, unix_path, connections, sessions, duration, config=None, deadline=None, seed=0):
+    """Play sessions games at once on each of the connections for duration seconds and return the totals"""
+    random.seed(seed)
+    results = {'moves': 0, 'games': 0, 'latencies': [], 'errors': {'busy': 0, 'timeout': 0, 'failed': 0, 'invalid': 0}}
+    opened = []
+    for _ in range(connections):
+        if unix_path is not None:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        opened.append(Connection(reader, writer))
+
+    start_time = time.perf_counter()
+    end_time = start_time + duration
+    await asyncio.gather(*(play_games(connection, end_time, config, deadline, results)
+                           for connection in opened for _ in range(sessions)))
+    results['elapsed'] = time.perf_counter() - start_time
+    results['server'] = await opened[0].request(op='stats')
+
+    for connection in opened:
+        await connection.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play many simultaneous games against the game server")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="address of the server")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help="TCP port of the server")
+    parser.add_argument('--unix', default=None,
+                        help="connect to this Unix socket path instead of TCP")
+    parser.add_argument('--connections', type=int, default=10,
+                        help="number of connections to the server")
+    parser.add_argument('--sessions', type=int, default=10,
+                        help="number of games played at once on every connection")
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help="seconds to keep playing")
+    parser.add_argument('--config', default=None,
+                        help="engine configuration of the games, the server's default when not given")
+    parser.add_argument('--deadline', type=float, default=None,
+                        help="seconds a move may take, the server's default when not given")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="seed of the random moves")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load(args.host, args.port, args.unix, args.connections, args.sessions,
+                                   args.duration, args.config, args.deadline, args.seed))
+
+    latencies = results['latencies']
+    errors = results['errors']
+    print(f"\n{args.connections} connections x {args.sessions} sessions for {results['elapsed']:.1f}s")
+    print("-" * 65)
+    print(f"Computer moves per second: {results['moves'] / results['elapsed']:.1f}")
+    print(f"Games finished: {results['games']}")
+    print(f"Move latency p50 / p95 / p99 / max: {percentile(latencies, 0.5) * 1000:.1f} / "
+          f"{percentile(latencies, 0.95) * 1000:.1f} / {percentile(latencies, 0.99) * 1000:.1f} / "
+          f"{max(latencies, default=0.0) * 1000:.1f} ms")
+    print(f"Refused moves: {errors['busy']} busy, {errors['timeout']} timed out, {errors['failed']} failed, "
+          f"{errors['invalid']} invalid")
+    print(f"Server: {results['server']}")
+    print("-" * 65)
@@ -0,0 +1,108 @@
+"""
+Move ordering for the alpha-beta search.
+
+Alpha-beta only prunes when a good move is searched early, so the order in
+which columns are tried decides how much of the tree gets cut. The orderer
+combines a static center-first order with the best move from the
+transposition table, killer moves and a history table, and counts how often
+the resulting order produces a cutoff.
+"""
+from bitboard import STANDARD
+
+# Columns of the standard board from the center outwards: center pieces belong to the most lines
+CENTER_ORDER = STANDARD.center_order
+
+# Killer moves remembered per ply
+KILLER_SLOTS = 2
+
+# Which heuristics each named strategy uses, from weakest to strongest
+STRATEGIES = {
+    'static': {'center': False, 'tt_move': False, 'killers': False, 'history': False},
+    'center': {'center': True, 'tt_move': False, 'killers': False, 'history': False},
+    'tt_move': {'center': True, 'tt_move': True, 'killers': False, 'history': False},
+    'killers': {'center': True, 'tt_move': True, 'killers': True, 'history': False},
+    'history': {'center': True, 'tt_move': True, 'killers': False, 'history': True},
+    'full': {'center': True, 'tt_move': True, 'killers': True, 'history': True},
+}
+
+
+class MoveOrderer:
+    """Orders the columns of a node so the likely best move is searched first"""
+
+    def __init__(self, strategy='full', geometry=STANDARD):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown move ordering strategy: {strategy}")
+
+        self.strategy = strategy
+        self.geometry = geometry
+        self.center_order = geometry.center_order
+        self.use_center = STRATEGIES[strategy]['center']
+        self.use_tt_move = STRATEGIES[strategy]['tt_move']
+        self.use_killers = STRATEGIES[strategy]['killers']
+        self.use_history = STRATEGIES[strategy]['history']
+        self.clear()
+
+    def clear(self):
+        """Forget killers and history and reset the counters"""
+        # Indexed by the number of pieces on the board, so plies line up
+        # between iterations of iterative deepening
+        self.killers = [[None] * KILLER_SLOTS for _ in range(self.geometry.cells + 1)]
+        # Indexed by max_player, then column
+        self.history = [[0] * self.geometry.columns, [0] * self.geometry.columns]
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.ordered_nodes = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        # Cutoffs by position of the cutting move in the order
+        self.cutoff_indices = [0] * self.geometry.columns
+
+    def order(self, moves, ply, max_player, tt_move=None):
+        """Return moves sorted from most to least promising"""
+        self.ordered_nodes += 1
+
+        if self.use_center:
+            moves = [col for col in self.center_order if col in moves]
+        else:
+            moves = list(moves)
+
+        if self.use_history:
+            # sort is stable, so ties keep the center-first order
+            history = self.history[max_player]
+            moves.sort(key=lambda col: -history[col])
+
+        if self.use_killers:
+            for killer in reversed(self.killers[ply]):
+                if killer in moves:
+                    moves.remove(killer)
+                    moves.insert(0, killer)
+
+        if self.use_tt_move and tt_move in moves:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+
+        return moves
+
+    def record_cutoff(self, col, ply, max_player, depth, index):
+        """Remember a move that caused a beta cutoff at position index of the order"""
+        self.cutoffs += 1
+        self.cutoff_indices[index] += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+        if self.use_killers:
+            killers = self.killers[ply]
+            if killers[0] != col:
+                killers[1:] = killers[:-1]
+                killers[0] = col
+
+        if self.use_history:
+            # Deep cutoffs prune larger subtrees, so they weigh more
+            self.history[max_player][col] += depth * depth
+
+    def cutoff_rate(self):
+        return self.cutoffs / self.ordered_nodes if self.ordered_nodes else 0.0
+
+    def first_move_cutoff_rate(self):
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
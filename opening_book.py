@@ -0,0 +1,165 @@
+"""
+Opening book: precomputed computer moves for the first plies of a game.
+
+The book file starts with a header followed by fixed-size records sorted by
+position key:
+
+    header: magic b'C4BK', version, max plies, search depth, number of records
+    record: position key (uint64), best column (uint8)
+
+A position and its mirror image share one record, stored under the smaller of
+the two keys with the move for that orientation. The file is opened with mmap
+and probed with a binary search, so nothing is parsed up front and a lookup
+only touches a handful of records.
+
+Run this file to generate the book:
+
+    python3 opening_book.py --plies 4 --depth 8
+"""
+import mmap
+import os
+import struct
+
+from bitboard import Position, COLUMNS, PLAYER, COMPUTER
+from engine import Engine
+
+MAGIC = b'C4BK'
+VERSION = 1
+HEADER = struct.Struct('<4sHBBI')
+RECORD = struct.Struct('<QB')
+
+DEFAULT_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+
+
+def computer_positions(max_plies):
+    """Yield one position per mirror pair where the computer is to move
+
+    Games start with the player, so the computer moves when an odd number of
+    pieces is on the board. Positions that are already won are skipped.
+    """
+    seen = set()
+    frontier = [Position()]
+    for ply in range(max_plies):
+        piece = PLAYER if ply % 2 == 0 else COMPUTER
+        next_frontier = []
+        for position in frontier:
+            for col in position.valid_columns():
+                child = position.copy()
+                child.play(col, piece)
+                key, _ = child.canonical_key()
+                if key in seen or child.is_win(piece):
+                    continue
+                seen.add(key)
+                next_frontier.append(child)
+                if piece == PLAYER:
+                    yield child
+        frontier = next_frontier
+
+
+def search_book_move(position, depth):
+    """Return the canonical key of position and the deep-search move for it"""
+    engine = Engine(position)
+    column, _ = engine.iterative_deepening(position, depth)
+    key, mirrored = position.canonical_key()
+    return key, COLUMNS - 1 - column if mirrored else column
+
+
+def generate_book(path=DEFAULT_BOOK_PATH, max_plies=4, depth=8, workers=None):
+    """Search every computer-to-move position up to max_plies and write the book"""
+    # Only generating the book needs worker processes, the game just reads it
+    from concurrent.futures import ProcessPoolExecutor
+
+    positions = list(computer_positions(max_plies))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        records = dict(executor.map(search_book_move, positions, [depth] * len(positions)))
+
+    with open(path, 'wb') as book_file:
+        book_file.write(HEADER.pack(MAGIC, VERSION, max_plies, depth, len(records)))
+        for key in sorted(records):
+            book_file.write(RECORD.pack(key, records[key]))
+
+    return len(records)
+
+
+class OpeningBook:
+    """Read-only, memory-mapped view of a book file"""
+
+    def __init__(self, path=DEFAULT_BOOK_PATH):
+        self.path = path
+        with open(path, 'rb') as book_file:
+            self.data = mmap.mmap(book_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.data) < HEADER.size:
+            self.data.close()
+            raise ValueError(f"{path} is not an opening book")
+        magic, version, self.max_plies, self.depth, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+        if len(self.data) != HEADER.size + self.count * RECORD.size:
+            self.data.close()
+            raise ValueError(f"{path} is truncated")
+
+        self.probes = 0
+        self.hits = 0
+
+    def probe(self, position):
+        """Return the book column for position, or None when it is not in the book"""
+        self.probes += 1
+        if position.num_moves >= self.max_plies:
+            return None
+
+        key, mirrored = position.canonical_key()
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            record_key, column = RECORD.unpack_from(self.data, HEADER.size + middle * RECORD.size)
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                self.hits += 1
+                return COLUMNS - 1 - column if mirrored else column
+        return None
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def size_bytes(self):
+        return len(self.data)
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self.data.close()
+
+
+def load_book(path=DEFAULT_BOOK_PATH):
+    """Open the book at path, or return None if there is no usable book"""
+    try:
+        return OpeningBook(path)
+    except (OSError, ValueError):
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Generate the Connect Four opening book")
+    parser.add_argument('--plies', type=int, default=4,
+                        help="cover positions with fewer pieces than this on the board")
+    parser.add_argument('--depth', type=int, default=8,
+                        help="search depth used for every book move")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of processes searching book positions")
+    parser.add_argument('--output', default=DEFAULT_BOOK_PATH,
+                        help="path of the book file to write")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    count = generate_book(args.output, args.plies, args.depth, args.workers)
+    elapsed = time.perf_counter() - start_time
+    print(f"Wrote {count} positions ({os.path.getsize(args.output)} bytes) to {args.output} in {elapsed:.1f}s")
@@ -0,0 +1,61 @@
+"""
+Root-parallel minimax search.
+
+Every legal root move is searched to depth - 1 in its own task on a
+ProcessPoolExecutor, and the best of the returned scores is played. Each task
+starts from a fresh search state with a full window, so the chosen move and
+score only depend on the position and the seed, never on how many workers
+there are or in which order the tasks finish.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import os
+import random
+
+from bitboard import PLAYER, COMPUTER
+from engine import Engine
+from move_ordering import CENTER_ORDER
+
+
+def search_root_move(board, col, depth, max_player, seed):
+    """Play col for the side to move and search the reply; runs in a worker process"""
+    random.seed(seed)
+    engine = Engine(board)
+
+    child = board.copy()
+    child.play(col, PLAYER if max_player else COMPUTER)
+    _, value = engine.minimax(child, depth - 1, -float('inf'), float('inf'), not max_player)
+    return col, value, engine.nodes + 1, os.getpid()
+
+
+def parallel_search(board, depth, workers=None, max_player=False, seed=0, executor=None):
+    """Search the root moves of board across processes
+
+    Returns (column, value, nodes per worker process). Pass an executor to
+    reuse one pool across searches instead of starting workers every call.
+    """
+    columns = [col for col in CENTER_ORDER if board.can_play(col)]
+    if depth < 1 or not columns:
+        return None, None, {}
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+
+    try:
+        futures = [executor.submit(search_root_move, board, col, depth, max_player, seed + col)
+                   for col in columns]
+        results = [future.result() for future in futures]
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    worker_nodes = {}
+    best_column, best_value = None, None
+    # Results are in CENTER_ORDER, so ties always go to the same column
+    for col, value, nodes, pid in results:
+        worker_nodes[pid] = worker_nodes.get(pid, 0) + nodes
+        if (best_value is None or (max_player and value > best_value)
+                or (not max_player and value < best_value)):
+            best_column, best_value = col, value
+
+    return best_column, best_value, worker_nodes
@@ -1,17 +1,73 @@
-import numpy as np
 import time
+import math
 import random
 import csv
-from UI_Implementation import ConnectFour, ROWS, COLUMNS, PLAYER, COMPUTER, EMPTY
+import argparse
+import compileall
+import os
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from engine import Engine, SEARCH_ALGORITHMS
+from bitboard import Position, Geometry, ROWS, COLUMNS, PLAYER, COMPUTER
+from move_ordering import MoveOrderer, STRATEGIES
+import windows
+from parallel_search import parallel_search
+from opening_book import OpeningBook, DEFAULT_BOOK_PATH
+from search_cache import SearchCache, HEADER, RECORD, COMPACTED_FRACTION
+from endgame import EndgameSolver, opponent_of
+from corpus import CORPUS_VERSION, PHASES, DEFAULT_CORPUS_PATH, load_corpus, position_from_moves, side_to_move
 
-class PerformanceTester(ConnectFour):
+# Columns added to the CSVs by the search statistics collector
+STATS_FIELDS = ['nodes_by_ply', 'leaf_evaluations', 'terminal_leaves', 'cutoff_indices',
+                'first_move_cutoff_rate', 'effective_branching_factor', 'eval_time', 'win_check_time']
+
+# Engine configurations of the corpus benchmark. Budgets are in nodes, not
+# seconds, so every run searches exactly the same trees
+BENCHMARK_CONFIGS = {
+    'easy': {'max_depth': 2},
+    'medium': {'max_depth': 4},
+    'depth6': {'max_depth': 6},
+    'depth6-static': {'max_depth': 6, 'ordering': 'static'},
+    'depth6-nothreats': {'max_depth': 6, 'threat_pass': False},
+    'depth6-minimax': {'max_depth': 6, 'algorithm': 'minimax'},
+    'nodes10k': {'node_budget': 10000},
+}
+
+# (rows, columns, connect) of the board geometry benchmark, by board area
+BENCHMARK_GEOMETRIES = ((6, 7, 4), (7, 8, 4), (8, 9, 4), (9, 10, 4), (6, 7, 5), (7, 8, 5), (8, 9, 5))
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of values"""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(len(ordered) * fraction) - 1)]
+
+def random_quiet_position(geometry, num_moves):
+    """Play num_moves random moves that never win on a board of geometry, or return None if stuck"""
+    position = Position(geometry)
+    piece = PLAYER
+    for _ in range(num_moves):
+        quiet_moves = []
+        for col in position.valid_columns():
+            position.play(col, piece)
+            if not position.last_move_wins():
+                quiet_moves.append(col)
+            position.undo()
+        if not quiet_moves:
+            return None
+        position.play(random.choice(quiet_moves), piece)
+        piece = opponent_of(piece)
+    return position
+
+class PerformanceTester(Engine):
     def __init__(self):
-        # Skip UI initialization, we're only using the game logic
-        self.board = np.zeros((ROWS, COLUMNS), dtype=int)
+        # The engine has no window, so only the game state needs setting up
+        super().__init__()
         self.game_over = False
         self.current_player = PLAYER
-        self.ai_difficulty = None
-        self.game_started = False
         
     def minimax_no_pruning(self, board, depth, max_player):
         """Minimax implementation without alpha-beta pruning for comparison"""
@@ -20,9 +76,10 @@ class PerformanceTester(ConnectFour):
 
         if depth == 0 or is_terminal:
             if is_terminal:
-                if self.check_winner(COMPUTER):
+                winner = self.winner(board)
+                if winner == COMPUTER:
                     return (None, -1000000)
-                elif self.check_winner(PLAYER):
+                elif winner == PLAYER:
                     return (None, 1000000 + 5000)
                 else:  # Game is over, no more valid moves
                     return (None, 0)
@@ -35,12 +92,11 @@ class PerformanceTester(ConnectFour):
             column = random.choice(valid_locations) if valid_locations else None
 
             for col in valid_locations:
-                row = self.next_free_row(col, board)
-                temp_board = board.copy()
-                self.place_piece(row, col, PLAYER, temp_board)
+                board.play(col, PLAYER)
 
                 # Calculate a score based on the position of the dropped piece
-                new_score = self.minimax_no_pruning(temp_board, depth-1, False)[1]
+                new_score = self.minimax_no_pruning(board, depth-1, False)[1]
+                board.undo()
 
                 if new_score > value:
                     value = new_score
@@ -53,12 +109,11 @@ class PerformanceTester(ConnectFour):
             column = random.choice(valid_locations) if valid_locations else None
 
             for col in valid_locations:
-                row = self.next_free_row(col, board)
-                temp_board = board.copy()
-                self.place_piece(row, col, COMPUTER, temp_board)
+                board.play(col, COMPUTER)
 
                 # Calculate a score based on the position of the dropped piece
-                new_score = self.minimax_no_pruning(temp_board, depth-1, True)[1]
+                new_score = self.minimax_no_pruning(board, depth-1, True)[1]
+                board.undo()
 
                 if new_score < value:
                     value = new_score
@@ -68,7 +123,7 @@ class PerformanceTester(ConnectFour):
     
     def reset_board(self):
         """Reset the game board to initial state"""
-        self.board = np.zeros((ROWS, COLUMNS), dtype=int)
+        self.board = Position()
         self.game_over = False
         self.current_player = PLAYER
         
@@ -82,9 +137,8 @@ class PerformanceTester(ConnectFour):
                 break
                 
             col = random.choice(valid_cols)
-            row = self.next_free_row(col, self.board)
             player = random.choice([PLAYER, COMPUTER])
-            self.board[row][col] = player
+            self.board.play(col, player)
             
             # Break if the game is already over
             if self.check_winner(PLAYER) or self.check_winner(COMPUTER):
@@ -106,18 +160,40 @@ class PerformanceTester(ConnectFour):
                 
                 board_state = self.board.copy()
                 
-                # Test with alpha-beta pruning
-                start_time = time.time()
+                # Test with alpha-beta pruning and a cold transposition table
+                table = self.transposition_table
+                table.clear()
+                allocations = Position.allocations
+                start_time = time.perf_counter()
                 col_with_pruning, _ = self.minimax(board_state, depth, -float('inf'), float('inf'), False)
-                time_with_pruning = time.time() - start_time
+                time_with_pruning = time.perf_counter() - start_time
+                allocations_with_pruning = Position.allocations - allocations
+
+                # Test with alpha-beta pruning alone to see what the table saved
+                self.transposition_table = None
+                start_time = time.perf_counter()
+                self.minimax(board_state, depth, -float('inf'), float('inf'), False)
+                time_without_table = time.perf_counter() - start_time
+                self.transposition_table = table
                 
                 # Test without alpha-beta pruning
-                start_time = time.time()
+                allocations = Position.allocations
+                start_time = time.perf_counter()
                 col_without_pruning, _ = self.minimax_no_pruning(board_state, depth, False)
-                time_without_pruning = time.time() - start_time
+                time_without_pruning = time.perf_counter() - start_time
+                allocations_without_pruning = Position.allocations - allocations
 
                 # Calculate speedup factor (mult)
                 speedup_factor = time_without_pruning / time_with_pruning if time_with_pruning > 0 else 0
+                tt_hits, tt_misses, tt_overwrites = table.hits, table.misses, table.overwrites
+
+                # Search once more with the statistics collector, outside the timed runs
+                table.clear()
+                self.move_orderer.reset_counters()
+                stats = self.enable_stats()
+                self.minimax(board_state, depth, -float('inf'), float('inf'), False)
+                search_stats = stats.summary()
+                self.disable_stats()
                 
                 # Store results
                 results.append({
@@ -128,19 +204,616 @@ class PerformanceTester(ConnectFour):
                     'column_chosen_without_pruning': col_without_pruning,
                     'time_with_pruning': time_with_pruning,
                     'time_without_pruning': time_without_pruning,
-                    'speedup_factor': speedup_factor
+                    'speedup_factor': speedup_factor,
+                    'time_without_table': time_without_table,
+                    'tt_hits': tt_hits,
+                    'tt_misses': tt_misses,
+                    'tt_overwrites': tt_overwrites,
+                    'allocations_with_pruning': allocations_with_pruning,
+                    'allocations_without_pruning': allocations_without_pruning,
+                    **search_stats
                 })
                 
-                print(f"Test {test_num + 1} at depth {depth}: With pruning: {time_with_pruning:.6f}s, Without: {time_without_pruning:.6f}s")
+                print(f"Test {test_num + 1} at depth {depth}: With pruning: {time_with_pruning:.6f}s, Without: {time_without_pruning:.6f}s, "
+                      f"Without table: {time_without_table:.6f}s, TT hits: {tt_hits}, "
+                      f"Board allocations: {allocations_with_pruning}/{allocations_without_pruning}")
         
         return results
     
+    def test_iterative_deepening(self, num_tests, moves_range=(5, 20), time_budgets=(0.25, 0.5, 1.0)):
+        """Measure per-move latency and depth reached by the budgeted iterative deepening search"""
+        results = []
+
+        for time_budget in time_budgets:
+            for test_num in range(num_tests):
+                num_moves = random.randint(*moves_range)
+                self.randomize_board(num_moves)
+                while self.check_winner(PLAYER) or self.check_winner(COMPUTER):
+                    self.randomize_board(num_moves)
+
+                self.transposition_table.clear()
+                start_time = time.perf_counter()
+                column, _ = self.iterative_deepening(self.board.copy(), time_budget=time_budget)
+                latency = time.perf_counter() - start_time
+
+                results.append({
+                    'time_budget': time_budget,
+                    'test_num': test_num + 1,
+                    'board_moves': num_moves,
+                    'column_chosen': column,
+                    'depth_reached': self.completed_depth,
+                    'nodes': self.nodes,
+                    'latency': latency
+                })
+
+                print(f"Test {test_num + 1} with {time_budget}s budget: depth {self.completed_depth}, "
+                      f"{self.nodes} nodes, {latency:.6f}s")
+
+        return results
+
+    def benchmark_move_ordering(self, num_tests, moves_range=(5, 20), depth=6, strategies=tuple(STRATEGIES)):
+        """Search the same positions with every move ordering strategy and compare cutoffs"""
+        positions = []
+        for _ in range(num_tests):
+            num_moves = random.randint(*moves_range)
+            self.randomize_board(num_moves)
+            while self.check_winner(PLAYER) or self.check_winner(COMPUTER):
+                self.randomize_board(num_moves)
+            positions.append(self.board.copy())
+
+        results = []
+        orderer = self.move_orderer
+        for strategy in strategies:
+            for test_num, position in enumerate(positions):
+                self.move_orderer = MoveOrderer(strategy)
+                self.transposition_table.clear()
+
+                start_time = time.perf_counter()
+                column, _ = self.iterative_deepening(position.copy(), depth)
+                elapsed = time.perf_counter() - start_time
+
+                results.append({
+                    'strategy': strategy,
+                    'test_num': test_num + 1,
+                    'depth': depth,
+                    'column_chosen': column,
+                    'nodes': self.nodes,
+                    'time': elapsed,
+                    'cutoff_rate': self.move_orderer.cutoff_rate(),
+                    'first_move_cutoff_rate': self.move_orderer.first_move_cutoff_rate()
+                })
+        self.move_orderer = orderer
+
+        return results
+
+    def benchmark_parallel_scaling(self, num_tests, moves_range=(5, 20), depth=7, max_workers=None):
+        """Time the root-parallel search with 1..max_workers processes on the same positions"""
+        max_workers = max_workers or os.cpu_count()
+        positions = []
+        for _ in range(num_tests):
+            num_moves = random.randint(*moves_range)
+            self.randomize_board(num_moves)
+            while self.check_winner(PLAYER) or self.check_winner(COMPUTER):
+                self.randomize_board(num_moves)
+            positions.append(self.board.copy())
+
+        results = []
+        for workers in range(1, max_workers + 1):
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # Start the worker processes before timing anything
+                parallel_search(positions[0], 1, executor=executor)
+
+                for test_num, position in enumerate(positions):
+                    start_time = time.perf_counter()
+                    column, _, worker_nodes = parallel_search(position, depth, executor=executor)
+                    elapsed = time.perf_counter() - start_time
+
+                    results.append({
+                        'workers': workers,
+                        'test_num': test_num + 1,
+                        'depth': depth,
+                        'column_chosen': column,
+                        'nodes': sum(worker_nodes.values()),
+                        'nodes_per_worker': sorted(worker_nodes.values(), reverse=True),
+                        'time': elapsed
+                    })
+
+        return results
+
+    def compare_search_algorithms(self, num_tests, moves_range=(5, 20), depths=(4, 6, 8)):
+        """Search the same positions with minimax and with negamax, PVS and aspiration windows
+
+        Both run through iterative deepening with a cold table. The searches
+        are also repeated without a table, where both must return the exact
+        same score, to confirm negamax gives up nothing for its smaller tree.
+        """
+        positions = []
+        while len(positions) < num_tests:
+            self.randomize_board(random.randint(*moves_range))
+            if not self.is_end_of_game(self.board):
+                positions.append(self.board.copy())
+
+        results = []
+        for depth in depths:
+            for test_num, position in enumerate(positions):
+                max_player = position.num_moves % 2 == 0
+                color = 1 if max_player else -1
+                result = {'test_num': test_num + 1, 'depth': depth}
+                for algorithm in SEARCH_ALGORITHMS:
+                    self.algorithm = algorithm
+                    self.transposition_table.clear()
+                    self.move_orderer.clear()
+
+                    start_time = time.perf_counter()
+                    column, value = self.iterative_deepening(position, depth, max_player=max_player)
+                    elapsed = time.perf_counter() - start_time
+
+                    result[f'{algorithm}_column'] = column
+                    result[f'{algorithm}_value'] = value
+                    result[f'{algorithm}_nodes'] = self.nodes
+                    result[f'{algorithm}_time'] = elapsed
+
+                table, self.transposition_table = self.transposition_table, None
+                _, minimax_value = self.minimax(position.copy(), depth, -float('inf'), float('inf'), max_player)
+                _, negamax_score = self.negamax(position.copy(), depth, -float('inf'), float('inf'), color)
+                self.transposition_table = table
+                result['exact_match'] = minimax_value == color * negamax_score
+                results.append(result)
+        self.algorithm = 'negamax'
+
+        return results
+
+    def benchmark_geometries(self, geometries=BENCHMARK_GEOMETRIES, num_tests=10, depth=6, fill=0.25):
+        """Search quiet random positions a quarter full on boards of every geometry at a fixed depth"""
+        results = []
+        for rows, columns, connect in geometries:
+            geometry = Geometry(rows, columns, connect)
+            engine = Engine(geometry=geometry)
+            for test_num in range(num_tests):
+                # Positions with a threat on the board are settled without a search
+                position = None
+                while position is None or position.threat_cells(PLAYER) or position.threat_cells(COMPUTER):
+                    position = random_quiet_position(geometry, int(geometry.cells * fill))
+                engine.transposition_table.clear()
+                engine.move_orderer.clear()
+
+                start_time = time.perf_counter()
+                column, _ = engine.iterative_deepening(position, depth, max_player=position.num_moves % 2 == 0)
+                latency = time.perf_counter() - start_time
+
+                results.append({
+                    'geometry': f"{rows}x{columns} connect {connect}",
+                    'area': geometry.cells,
+                    'test_num': test_num + 1,
+                    'column_chosen': column,
+                    'nodes': engine.nodes,
+                    'latency': latency
+                })
+
+        return results
+
+    def benchmark_corpus(self, corpus, configs=tuple(BENCHMARK_CONFIGS), seed=0, collect_stats=False):
+        """Search every corpus position with every engine configuration from a cold start
+
+        With collect_stats the search statistics are added to every result, at
+        the cost of slower searches.
+        """
+        results = []
+        orderer = self.move_orderer
+        stats = self.enable_stats() if collect_stats else None
+
+        for config in configs:
+            settings = BENCHMARK_CONFIGS[config]
+            for position_id, (phase, moves) in enumerate(corpus):
+                position = position_from_moves(moves)
+                self.move_orderer = MoveOrderer(settings.get('ordering', 'full'))
+                self.threat_pass = settings.get('threat_pass', True)
+                self.algorithm = settings.get('algorithm', 'negamax')
+                self.transposition_table.clear()
+                self.endgame_solver.table.clear()
+                # Ties are broken with random, so seed every search the same way
+                random.seed(seed)
+
+                start_time = time.perf_counter()
+                column, _ = self.iterative_deepening(position, settings.get('max_depth'),
+                                                     node_budget=settings.get('node_budget'),
+                                                     max_player=side_to_move(position) == PLAYER)
+                latency = time.perf_counter() - start_time
+
+                results.append({
+                    'corpus_version': CORPUS_VERSION,
+                    'seed': seed,
+                    'config': config,
+                    'position_id': position_id + 1,
+                    'phase': phase,
+                    'ply': len(moves),
+                    'column_chosen': column,
+                    'depth_reached': self.completed_depth,
+                    'nodes': self.nodes,
+                    'nodes_per_second': self.nodes / latency if latency > 0 else 0.0,
+                    'cutoffs': self.move_orderer.cutoffs,
+                    'latency': latency,
+                    **(stats.summary() if stats is not None else {})
+                })
+        self.move_orderer = orderer
+        self.threat_pass = True
+        self.algorithm = 'negamax'
+        self.disable_stats()
+
+        return results
+
+    def random_endgame(self, empty_cells):
+        """Play random moves that never win until empty_cells are left, return the side to move"""
+        while True:
+            self.reset_board()
+            piece = PLAYER
+            while self.board.num_moves < ROWS * COLUMNS - empty_cells:
+                quiet_moves = []
+                for col in self.get_valid_columns(self.board):
+                    self.board.play(col, piece)
+                    if not self.check_winner(piece):
+                        quiet_moves.append(col)
+                    self.board.undo()
+                if not quiet_moves:
+                    break
+                self.board.play(random.choice(quiet_moves), piece)
+                piece = opponent_of(piece)
+            else:
+                # An immediate win would be solved without any search
+                if not self.board.has_possible_four(piece):
+                    return piece
+
+    def benchmark_endgame(self, num_tests, empty_cells_range=range(4, 25, 2), heuristic_depth=5):
+        """Time the exact solver against the heuristic search by number of empty cells"""
+        results = []
+
+        for empty_cells in empty_cells_range:
+            for test_num in range(num_tests):
+                piece = self.random_endgame(empty_cells)
+                position = self.board.copy()
+
+                solver = EndgameSolver()
+                start_time = time.perf_counter()
+                column, score = solver.best_move(position, piece)
+                solve_time = time.perf_counter() - start_time
+                nodes = solver.nodes
+
+                self.transposition_table.clear()
+                start_time = time.perf_counter()
+                heuristic_column, _ = self.minimax(position.copy(), heuristic_depth, -float('inf'), float('inf'),
+                                                   piece == PLAYER)
+                heuristic_time = time.perf_counter() - start_time
+
+                # Solve the heuristic's move to see if it gives away part of the result
+                child = position.copy()
+                child.play(heuristic_column, piece)
+                if child.is_win(piece):
+                    heuristic_score = empty_cells
+                elif child.is_full():
+                    heuristic_score = 0
+                else:
+                    heuristic_score = -solver.solve(child, opponent_of(piece))
+
+                results.append({
+                    'empty_cells': empty_cells,
+                    'test_num': test_num + 1,
+                    'column_chosen': column,
+                    'score': score,
+                    'solve_time': solve_time,
+                    'nodes': nodes,
+                    'heuristic_time': heuristic_time,
+                    # Only the outcome counts, a slower win is still a win
+                    'heuristic_correct': (heuristic_score > 0) - (heuristic_score < 0) == (score > 0) - (score < 0)
+                })
+
+        return results
+
+    def benchmark_opening_book(self, book, num_games):
+        """Probe the book along random games and measure hit rate and probe latency"""
+        book.probes = book.hits = 0
+        probe_times = []
+
+        for _ in range(num_games):
+            self.reset_board()
+            piece = PLAYER
+            while self.board.num_moves < book.max_plies and not self.board.is_full():
+                if piece == COMPUTER:
+                    start_time = time.perf_counter()
+                    book.probe(self.board)
+                    probe_times.append(time.perf_counter() - start_time)
+                self.board.play(random.choice(self.get_valid_columns(self.board)), piece)
+                if self.check_winner(piece):
+                    break
+                piece = COMPUTER if piece == PLAYER else PLAYER
+
+        return {
+            'entries': len(book),
+            'size_bytes': book.size_bytes(),
+            'probes': book.probes,
+            'hit_rate': book.hit_rate(),
+            'avg_probe_time': sum(probe_times) / len(probe_times) if probe_times else 0.0,
+            'max_probe_time': max(probe_times, default=0.0)
+        }
+
+    def verify_evaluation(self, num_positions, moves_range=(0, 42)):
+        """Check that the bitboard and vectorized array evaluations agree, return the mismatches"""
+        mismatches = []
+
+        for _ in range(num_positions):
+            self.randomize_board(random.randint(*moves_range))
+            board = self.board.to_array()
+
+            expected = windows.score_position(board, self.weights)
+            actual = self.score_position(self.board)
+            if expected != actual:
+                mismatches.append(('score_position', board, expected, actual))
+
+            for piece in (PLAYER, COMPUTER):
+                if windows.check_winner(board, piece) != self.check_winner(piece):
+                    mismatches.append(('check_winner', board, piece))
+                if windows.has_possible_four(board, piece) != self.has_possible_four(self.board, piece):
+                    mismatches.append(('has_possible_four', board, piece))
+                for x_in_a_row in (2, 3):
+                    if windows.count_lines(board, piece, x_in_a_row) != self.count_lines(self.board, piece, x_in_a_row):
+                        mismatches.append(('count_lines', board, piece, x_in_a_row))
+
+        return mismatches
+
+    def verify_terminal_detection(self, num_positions, moves_range=(0, 42), depth=4):
+        """Check that finished games are detected from the last move, inside the search tree too"""
+        mismatches = []
+
+        for _ in range(num_positions):
+            self.randomize_board(random.randint(*moves_range))
+            board = self.board
+
+            # The last-move check must agree with a scan of the whole board
+            expected = board.is_win(PLAYER) or board.is_win(COMPUTER) or board.is_full()
+            if self.is_end_of_game(board) != expected:
+                mismatches.append(('is_end_of_game', board.to_array(), expected))
+            if expected:
+                continue
+
+            # A side that can win right away has to be scored as winning, and
+            # the search must never play on once a game inside the tree is over
+            for piece in (PLAYER, COMPUTER):
+                searched = board.copy()
+                play = searched.play
+
+                def checked_play(col, piece, searched=searched, play=play):
+                    if searched.last_move_wins():
+                        mismatches.append(('played after a win', searched.to_array()))
+                    return play(col, piece)
+
+                searched.play = checked_play
+                self.transposition_table.clear()
+                _, value = self.minimax(searched, depth, -float('inf'), float('inf'), piece == PLAYER)
+
+                if board.has_possible_four(piece):
+                    won = value >= 1000000 if piece == PLAYER else value <= -1000000
+                    if not won:
+                        mismatches.append(('missed win', board.to_array(), piece, value))
+
+        return mismatches
+
+    def verify_mirror_symmetry(self, num_positions, moves_range=(0, 20), depth=4):
+        """Check that a position and its mirror image share one key and get mirrored best moves"""
+        mismatches = []
+
+        for _ in range(num_positions):
+            self.randomize_board(random.randint(*moves_range))
+            board = self.board
+            if self.is_end_of_game(board):
+                continue
+            mirrored = Position.from_array(board.to_array()[:, ::-1])
+            max_player = board.num_moves % 2 == 0
+
+            if mirrored.key() != board.mirrored_key() or mirrored.canonical_key()[0] != board.canonical_key()[0]:
+                mismatches.append(('canonical_key', board.to_array()))
+
+            # The mirror image hits the table entry of the original, which has
+            # to come back as the mirrored move with the same score
+            table = self.transposition_table
+            table.clear()
+            column, value = self.minimax(board, depth, -float('inf'), float('inf'), max_player)
+            key, flipped = mirrored.canonical_key()
+            entry = table.probe(key * 2 + max_player)
+            # A symmetric position is its own mirror image, either move is right
+            symmetric = board.key() == board.mirrored_key()
+            if entry is not None and not symmetric and (COLUMNS - 1 - entry[3] if flipped else entry[3]) != COLUMNS - 1 - column:
+                mismatches.append(('mirrored table move', board.to_array(), column, entry[3]))
+
+            mirrored_column, mirrored_value = self.minimax(mirrored, depth, -float('inf'), float('inf'), max_player)
+            if mirrored_value != value:
+                mismatches.append(('mirrored best move', board.to_array(), value, mirrored_value))
+            elif mirrored_column != COLUMNS - 1 - column:
+                # Forced positions are settled before the table is probed, so
+                # another column that scores just as well is also right
+                self.transposition_table = None
+                mirrored.play(mirrored_column, PLAYER if max_player else COMPUTER)
+                _, move_value = self.minimax(mirrored, depth - 1, -float('inf'), float('inf'), not max_player)
+                mirrored.undo()
+                self.transposition_table = table
+                if move_value != value:
+                    mismatches.append(('mirrored best move', board.to_array(), column, mirrored_column))
+
+            # Without a table the full-window scores are exact, so they must match too
+            table, self.transposition_table = self.transposition_table, None
+            _, plain_value = self.minimax(mirrored, depth, -float('inf'), float('inf'), max_player)
+            self.transposition_table = table
+            if plain_value != value:
+                mismatches.append(('mirrored score', board.to_array(), value, plain_value))
+
+        return mismatches
+
+    def benchmark_mirror_keys(self, num_tests, phases=(('opening', (2, 8)), ('middlegame', (9, 20))), depth=8):
+        """Search the same positions with and without mirror keys and compare table use"""
+        results = []
+        for phase, moves_range in phases:
+            positions = []
+            while len(positions) < num_tests:
+                self.randomize_board(random.randint(*moves_range))
+                if not self.is_end_of_game(self.board):
+                    positions.append(self.board.copy())
+
+            for mirror_keys in (False, True):
+                self.mirror_keys = mirror_keys
+                for test_num, position in enumerate(positions):
+                    table = self.transposition_table
+                    table.clear()
+                    self.move_orderer.clear()
+                    max_player = position.num_moves % 2 == 0
+
+                    start_time = time.perf_counter()
+                    self.iterative_deepening(position, depth, max_player=max_player)
+                    elapsed = time.perf_counter() - start_time
+
+                    probes = table.hits + table.misses
+                    results.append({
+                        'phase': phase,
+                        'mirror_keys': mirror_keys,
+                        'test_num': test_num + 1,
+                        'nodes': self.nodes,
+                        'time': elapsed,
+                        'hit_rate': table.hits / probes if probes else 0.0,
+                        'entries': sum(key is not None for key in table.keys)
+                    })
+        self.mirror_keys = True
+
+        return results
+
+    def verify_search_cache(self, num_records=2000, max_records=1000):
+        """Check that cache records survive a reopen and that compaction keeps the deepest ones"""
+        mismatches = []
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.bin')
+            records = {}
+            cache = SearchCache(path, max_records=num_records)
+            for _ in range(num_records):
+                key = random.getrandbits(50)
+                record = (random.randint(1, 40), random.randint(-1000000, 1005000), random.randint(0, 2),
+                          random.randrange(COLUMNS))
+                cache.store(key, *record)
+                if key not in records or records[key][0] <= record[0]:
+                    records[key] = record
+            cache.close()
+
+            reader = SearchCache(path, readonly=True)
+            for key, record in records.items():
+                if reader.probe(key) != record:
+                    mismatches.append(('reopened record', key, record, reader.probe(key)))
+            reader.close()
+
+            # Compaction sorts the records, so they are found by the binary search
+            cache = SearchCache(path, max_records=max_records)
+            cache.compact()
+            kept = sorted(records.values(), key=lambda record: record[0], reverse=True)[int(max_records * COMPACTED_FRACTION) - 1][0]
+            reader = SearchCache(path, readonly=True)
+            if len(reader) != min(len(records), int(max_records * COMPACTED_FRACTION)):
+                mismatches.append(('compacted size', len(reader)))
+            for key, record in records.items():
+                found = reader.probe(key)
+                if found is not None and found != record:
+                    mismatches.append(('compacted record', key, record, found))
+                elif found is None and record[0] > kept:
+                    mismatches.append(('evicted deep record', key, record))
+            compacted = len(reader)
+            reader.close()
+            cache.close()
+
+            # Half a record left by an interrupted write must not shift the records appended after it
+            with open(path, 'ab') as cache_file:
+                cache_file.write(b'\xff' * (RECORD.size // 2))
+            appended = {}
+            cache = SearchCache(path)
+            for _ in range(100):
+                key = random.getrandbits(50)
+                appended[key] = (40, random.randint(-1000000, 1005000), random.randint(0, 2), random.randrange(COLUMNS))
+                cache.store(key, *appended[key])
+            cache.close()
+            reader = SearchCache(path, readonly=True)
+            if (reader.size_bytes() - HEADER.size) % RECORD.size or len(reader) != compacted + len(appended):
+                mismatches.append(('size after torn record', reader.size_bytes(), len(reader)))
+            for key, record in appended.items():
+                if reader.probe(key) != record:
+                    mismatches.append(('record after torn record', key, record, reader.probe(key)))
+            reader.close()
+
+            # A second writer of the file turns read-only instead of appending to it
+            if os.name == 'posix':
+                first, second = SearchCache(path), SearchCache(path)
+                first.store(random.getrandbits(50), 40, 0, 0, 0)
+                second.store(random.getrandbits(50), 40, 0, 0, 0)
+                if not second.readonly or second.stores:
+                    mismatches.append(('second writer', second.readonly, second.stores))
+                second.close()
+                first.close()
+
+        return mismatches
+
+    def benchmark_search_cache(self, num_tests, moves_range=(2, 12), depth=8):
+        """Time the same moves with an empty search cache and after a restart with the filled one"""
+        positions = []
+        while len(positions) < num_tests:
+            self.randomize_board(random.randint(*moves_range))
+            if not self.is_end_of_game(self.board):
+                positions.append(self.board.copy())
+
+        results = []
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'search_cache.bin')
+            # The warm pass opens the file the cold pass wrote, as a restarted
+            # game would, and read-only, as a worker process would
+            for run, readonly in (('cold', False), ('warm', True)):
+                self.search_cache = SearchCache(path, readonly=readonly)
+                for test_num, position in enumerate(positions):
+                    self.transposition_table.clear()
+                    self.move_orderer.clear()
+                    max_player = position.num_moves % 2 == 0
+
+                    start_time = time.perf_counter()
+                    _, value = self.iterative_deepening(position, depth, max_player=max_player)
+                    elapsed = time.perf_counter() - start_time
+
+                    results.append({
+                        'run': run,
+                        'test_num': test_num + 1,
+                        'board_moves': position.num_moves,
+                        'score': value,
+                        'nodes': self.nodes,
+                        'latency': elapsed,
+                        'cache_hit_rate': self.search_cache.hit_rate(),
+                        'cache_records': len(self.search_cache),
+                        'cache_bytes': self.search_cache.size_bytes()
+                    })
+                self.search_cache.close()
+        self.search_cache = None
+
+        return results
+
+    def save_benchmark_to_csv(self, results, filename="connect4_benchmark_results.csv"):
+        """Save one row per configuration and corpus position"""
+        with open(filename, 'w', newline='') as csvfile:
+            fieldnames = ['corpus_version', 'seed', 'config', 'position_id', 'phase', 'ply',
+                          'column_chosen', 'depth_reached', 'nodes', 'nodes_per_second', 'cutoffs', 'latency']
+            if results and 'nodes_by_ply' in results[0]:
+                fieldnames += STATS_FIELDS
+
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer.writeheader()
+            for result in results:
+                writer.writerow(result)
+
+        print(f"Benchmark results saved to {filename}")
+
     def save_results_to_csv(self, results, filename="connect4_performance_results.csv"):
         """Save performance results to a CSV file"""
         with open(filename, 'w', newline='') as csvfile:
             fieldnames = ['test_num', 'depth', 'board_moves', 
                          'column_chosen_with_pruning', 'column_chosen_without_pruning',
-                         'time_with_pruning', 'time_without_pruning', 'speedup_factor']
+                         'time_with_pruning', 'time_without_pruning', 'speedup_factor',
+                         'time_without_table', 'tt_hits', 'tt_misses', 'tt_overwrites',
+                         'allocations_with_pruning', 'allocations_without_pruning'] + STATS_FIELDS
             
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
@@ -160,11 +833,28 @@ class PerformanceTester(ConnectFour):
             avg_time_with_pruning = sum(r['time_with_pruning'] for r in depth_results) / len(depth_results)
             avg_time_without_pruning = sum(r['time_without_pruning'] for r in depth_results) / len(depth_results)
             avg_speedup = sum(r['speedup_factor'] for r in depth_results) / len(depth_results)
+            avg_time_without_table = sum(r['time_without_table'] for r in depth_results) / len(depth_results)
+            tt_hits = sum(r['tt_hits'] for r in depth_results)
+            tt_probes = tt_hits + sum(r['tt_misses'] for r in depth_results)
+            avg_allocations = sum(r['allocations_with_pruning'] for r in depth_results) / len(depth_results)
+            avg_ebf = sum(r['effective_branching_factor'] for r in depth_results) / len(depth_results)
+            avg_first_move_rate = sum(r['first_move_cutoff_rate'] for r in depth_results) / len(depth_results)
+            avg_leaf_evaluations = sum(r['leaf_evaluations'] for r in depth_results) / len(depth_results)
+            avg_eval_time = sum(r['eval_time'] for r in depth_results) / len(depth_results)
+            avg_win_check_time = sum(r['win_check_time'] for r in depth_results) / len(depth_results)
             
             summary[depth] = {
                 'avg_time_with_pruning': avg_time_with_pruning,
                 'avg_time_without_pruning': avg_time_without_pruning,
                 'avg_speedup': avg_speedup,
+                'avg_time_without_table': avg_time_without_table,
+                'tt_hit_rate': tt_hits / tt_probes if tt_probes else 0.0,
+                'avg_allocations_per_search': avg_allocations,
+                'avg_effective_branching_factor': avg_ebf,
+                'avg_first_move_cutoff_rate': avg_first_move_rate,
+                'avg_leaf_evaluations': avg_leaf_evaluations,
+                'avg_eval_time': avg_eval_time,
+                'avg_win_check_time': avg_win_check_time,
                 'difficulty': "Easy" if depth == 2 else "Medium" if depth == 4 else "Hard"
             }
         
@@ -174,7 +864,10 @@ class PerformanceTester(ConnectFour):
         """Save performance summary to a CSV file"""
         with open(filename, 'w', newline='') as csvfile:
             fieldnames = ['depth', 'difficulty', 'avg_time_with_pruning', 
-                         'avg_time_without_pruning', 'avg_speedup']
+                         'avg_time_without_pruning', 'avg_speedup',
+                         'avg_time_without_table', 'tt_hit_rate', 'avg_allocations_per_search',
+                         'avg_effective_branching_factor', 'avg_first_move_cutoff_rate',
+                         'avg_leaf_evaluations', 'avg_eval_time', 'avg_win_check_time']
             
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
@@ -184,14 +877,342 @@ class PerformanceTester(ConnectFour):
                     'difficulty': data['difficulty'],
                     'avg_time_with_pruning': data['avg_time_with_pruning'],
                     'avg_time_without_pruning': data['avg_time_without_pruning'],
-                    'avg_speedup': data['avg_speedup']
+                    'avg_speedup': data['avg_speedup'],
+                    'avg_time_without_table': data['avg_time_without_table'],
+                    'tt_hit_rate': data['tt_hit_rate'],
+                    'avg_allocations_per_search': data['avg_allocations_per_search'],
+                    'avg_effective_branching_factor': data['avg_effective_branching_factor'],
+                    'avg_first_move_cutoff_rate': data['avg_first_move_cutoff_rate'],
+                    'avg_leaf_evaluations': data['avg_leaf_evaluations'],
+                    'avg_eval_time': data['avg_eval_time'],
+                    'avg_win_check_time': data['avg_win_check_time']
                 })
         
         print(f"Summary saved to {filename}")
 
+# Run in a fresh interpreter so nothing is imported yet
+IMPORT_TIME_SCRIPT = """
+import sys, time
+start_time = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start_time
+print(elapsed, 'tkinter' in sys.modules, 'numpy' in sys.modules)
+"""
+
+def measure_import_time(module, runs=5):
+    """Return the best import time of module over runs and whether it loaded tkinter and numpy"""
+    best_time = None
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', IMPORT_TIME_SCRIPT.format(module=module)],
+                                capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+        elapsed = float(output[0])
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+    return best_time, output[1] == 'True', output[2] == 'True'
+
+def run_import_benchmark(modules=('engine', 'parallel_search', 'opening_book', 'UI_Implementation')):
+    """Print how long each module takes to import and which heavy dependencies it pulls in"""
+    # Without cached bytecode, for example with PYTHONDONTWRITEBYTECODE set,
+    # every run would time compiling the modules as well
+    compileall.compile_dir(os.path.dirname(os.path.abspath(__file__)), maxlevels=0, quiet=1)
+    print("\nImport Time:")
+    print("-" * 65)
+    print(f"{'Module':<20} {'Best Time (ms)':<15} {'tkinter':<9} {'numpy':<6}")
+    print("-" * 65)
+    for module in modules:
+        elapsed, tkinter_loaded, numpy_loaded = measure_import_time(module)
+        print(f"{module:<20} {elapsed * 1000:<15.1f} {str(tkinter_loaded):<9} {str(numpy_loaded):<6}")
+    print("-" * 65)
+
+def run_ordering_benchmark(tester, num_tests, depth):
+    """Print nodes, time and cutoff rates of every move ordering strategy"""
+    print(f"Benchmarking move ordering at depth {depth}...")
+    results = tester.benchmark_move_ordering(num_tests=num_tests, moves_range=(5, 25), depth=depth)
+
+    print("\nMove Ordering:")
+    print("-" * 65)
+    print(f"{'Strategy':<10} {'Avg Nodes':<12} {'Avg Time':<12} {'Cutoff Rate':<13} {'First Move':<10}")
+    print("-" * 65)
+    for strategy in STRATEGIES:
+        strategy_results = [r for r in results if r['strategy'] == strategy]
+        if not strategy_results:
+            continue
+        count = len(strategy_results)
+        avg_nodes = sum(r['nodes'] for r in strategy_results) / count
+        avg_time = sum(r['time'] for r in strategy_results) / count
+        cutoff_rate = sum(r['cutoff_rate'] for r in strategy_results) / count
+        first_move_rate = sum(r['first_move_cutoff_rate'] for r in strategy_results) / count
+        print(f"{strategy:<10} {avg_nodes:<12.1f} {avg_time:<12.6f} {cutoff_rate:<13.2%} {first_move_rate:<10.2%}")
+    print("-" * 65)
+
+def run_scaling_benchmark(tester, num_tests, depth, max_workers):
+    """Print the speedup curve of the root-parallel search"""
+    print(f"Benchmarking root-parallel search at depth {depth}...")
+    results = tester.benchmark_parallel_scaling(num_tests=num_tests, moves_range=(5, 25),
+                                                depth=depth, max_workers=max_workers)
+
+    # The chosen move must not depend on the number of workers
+    columns = {}
+    for r in results:
+        columns.setdefault(r['test_num'], set()).add(r['column_chosen'])
+    deterministic = all(len(chosen) == 1 for chosen in columns.values())
+
+    print("\nParallel Scaling:")
+    print("-" * 65)
+    print(f"{'Workers':<8} {'Avg Time':<12} {'Speedup':<9} {'Avg Nodes':<12} {'Busiest Worker':<14}")
+    print("-" * 65)
+    base_time = None
+    for workers in sorted(set(r['workers'] for r in results)):
+        worker_results = [r for r in results if r['workers'] == workers]
+        count = len(worker_results)
+        avg_time = sum(r['time'] for r in worker_results) / count
+        avg_nodes = sum(r['nodes'] for r in worker_results) / count
+        busiest = sum(r['nodes_per_worker'][0] for r in worker_results) / count
+        base_time = base_time or avg_time
+        print(f"{workers:<8} {avg_time:<12.6f} {base_time / avg_time:<8.2f}x {avg_nodes:<12.1f} {busiest:<14.1f}")
+    print("-" * 65)
+    print(f"Same move for every worker count: {deterministic}")
+
+def run_corpus_benchmark(tester, corpus_path, configs, seed, collect_stats=False):
+    """Print nodes, speed, cutoffs and latency percentiles of every configuration by game phase"""
+    corpus = load_corpus(corpus_path)
+    print(f"Benchmarking {len(corpus)} positions of corpus version {CORPUS_VERSION} with seed {seed}...")
+    results = tester.benchmark_corpus(corpus, configs, seed, collect_stats)
+    tester.save_benchmark_to_csv(results)
+
+    print("\nCorpus Benchmark:")
+    print("-" * 99)
+    print(f"{'Config':<18} {'Phase':<11} {'Nodes':<10} {'kNodes/s':<9} {'Cutoffs':<9} "
+          f"{'p50 (ms)':<9} {'p95 (ms)':<9} {'Max (ms)':<9} {'Moves':<10}")
+    print("-" * 99)
+    for config in configs:
+        for phase in [phase for phase, _, _ in PHASES] + ['all']:
+            phase_results = [r for r in results if r['config'] == config and phase in (r['phase'], 'all')]
+            if not phase_results:
+                continue
+            nodes = sum(r['nodes'] for r in phase_results)
+            elapsed = sum(r['latency'] for r in phase_results)
+            cutoffs = sum(r['cutoffs'] for r in phase_results)
+            latencies = [r['latency'] * 1000 for r in phase_results]
+            # Compact fingerprint of the moves chosen, to compare runs at a glance
+            moves = ''.join(str(r['column_chosen']) for r in phase_results)
+            print(f"{config:<18} {phase:<11} {nodes:<10} {nodes / elapsed / 1000:<9.1f} {cutoffs:<9} "
+                  f"{percentile(latencies, 0.5):<9.2f} {percentile(latencies, 0.95):<9.2f} {max(latencies):<9.2f} "
+                  f"{moves if len(moves) <= 10 else moves[:7] + '...':<10}")
+    print("-" * 99)
+
+def run_algorithm_comparison(tester, num_tests):
+    """Print nodes, time and agreement of minimax and negamax by depth"""
+    print("Comparing minimax with negamax...")
+    results = tester.compare_search_algorithms(num_tests=num_tests)
+
+    print("\nMinimax vs Negamax (PVS, aspiration windows):")
+    print("-" * 90)
+    print(f"{'Depth':<6} {'Minimax Nodes':<14} {'Negamax Nodes':<14} {'Node Ratio':<11} {'Minimax Time':<13} "
+          f"{'Negamax Time':<13} {'Same Score':<11} {'Same Move':<10}")
+    print("-" * 90)
+    for depth in sorted(set(r['depth'] for r in results)):
+        rows = [r for r in results if r['depth'] == depth]
+        count = len(rows)
+        minimax_nodes = sum(r['minimax_nodes'] for r in rows) / count
+        negamax_nodes = sum(r['negamax_nodes'] for r in rows) / count
+        minimax_time = sum(r['minimax_time'] for r in rows) / count
+        negamax_time = sum(r['negamax_time'] for r in rows) / count
+        same_score = sum(r['exact_match'] for r in rows) / count
+        same_move = sum(r['minimax_column'] == r['negamax_column'] for r in rows) / count
+        print(f"{depth:<6} {minimax_nodes:<14.1f} {negamax_nodes:<14.1f} {negamax_nodes / minimax_nodes:<11.2f} "
+              f"{minimax_time:<13.4f} {negamax_time:<13.4f} {same_score:<11.0%} {same_move:<10.0%}")
+    print("-" * 90)
+
+def run_geometry_benchmark(tester, geometries, num_tests, depth):
+    """Print how nodes per second and latency scale with the board area"""
+    print(f"Benchmarking board geometries at depth {depth}...")
+    results = tester.benchmark_geometries(geometries, num_tests=num_tests, depth=depth)
+
+    print("\nBoard Geometries:")
+    print("-" * 80)
+    print(f"{'Geometry':<18} {'Area':<6} {'Avg Nodes':<11} {'kNodes/s':<9} {'p50 (ms)':<9} {'p95 (ms)':<9} {'Max (ms)':<9}")
+    print("-" * 80)
+    for geometry in dict.fromkeys(r['geometry'] for r in results):
+        rows = [r for r in results if r['geometry'] == geometry]
+        nodes = sum(r['nodes'] for r in rows)
+        elapsed = sum(r['latency'] for r in rows)
+        latencies = [r['latency'] * 1000 for r in rows]
+        print(f"{geometry:<18} {rows[0]['area']:<6} {nodes / len(rows):<11.1f} {nodes / elapsed / 1000:<9.1f} "
+              f"{percentile(latencies, 0.5):<9.2f} {percentile(latencies, 0.95):<9.2f} {max(latencies):<9.2f}")
+    print("-" * 80)
+
+def parse_geometry(text):
+    """Turn '7x8' or '7x8x5' into (rows, columns, connect)"""
+    sizes = [int(size) for size in text.lower().split('x')]
+    if len(sizes) not in (2, 3):
+        raise argparse.ArgumentTypeError(f"Expected ROWSxCOLUMNS or ROWSxCOLUMNSxCONNECT, got {text}")
+    return tuple(sizes) if len(sizes) == 3 else (*sizes, 4)
+
+def run_mirror_benchmark(tester, num_tests, depth):
+    """Print table entries, hit rate and nodes with and without mirror keys by game phase"""
+    print("Benchmarking mirror keys...")
+    results = tester.benchmark_mirror_keys(num_tests=num_tests, depth=depth)
+
+    print("\nMirror Keys:")
+    print("-" * 70)
+    print(f"{'Phase':<12} {'Mirror':<8} {'Avg Entries':<13} {'Hit Rate':<10} {'Avg Nodes':<11} {'Avg Time':<10}")
+    print("-" * 70)
+    for phase in dict.fromkeys(r['phase'] for r in results):
+        for mirror_keys in (False, True):
+            rows = [r for r in results if r['phase'] == phase and r['mirror_keys'] == mirror_keys]
+            count = len(rows)
+            print(f"{phase:<12} {'on' if mirror_keys else 'off':<8} {sum(r['entries'] for r in rows) / count:<13.1f} "
+                  f"{sum(r['hit_rate'] for r in rows) / count:<10.2%} {sum(r['nodes'] for r in rows) / count:<11.1f} "
+                  f"{sum(r['time'] for r in rows) / count:<10.4f}")
+    print("-" * 70)
+
+def run_cache_benchmark(tester, num_tests, depth):
+    """Print move latency with an empty search cache and with the one the first pass filled"""
+    print("Benchmarking the search cache...")
+    results = tester.benchmark_search_cache(num_tests=num_tests, depth=depth)
+
+    print(f"\nSearch Cache (depth {depth}):")
+    print("-" * 70)
+    print(f"{'Run':<6} {'Avg Latency':<13} {'P50 Latency':<13} {'P95 Latency':<13} {'Avg Nodes':<11} {'Hit Rate':<10}")
+    print("-" * 70)
+    for run in ('cold', 'warm'):
+        rows = [r for r in results if r['run'] == run]
+        latencies = [r['latency'] for r in rows]
+        print(f"{run:<6} {sum(latencies) / len(latencies) * 1000:<13.2f} {percentile(latencies, 0.5) * 1000:<13.2f} "
+              f"{percentile(latencies, 0.95) * 1000:<13.2f} {sum(r['nodes'] for r in rows) / len(rows):<11.1f} "
+              f"{rows[-1]['cache_hit_rate']:<10.2%}")
+    print("-" * 70)
+    last = results[-1]
+    print(f"Latencies in ms; cache file holds {last['cache_records']} records in {last['cache_bytes']} bytes")
+    same = sum(cold['score'] == warm['score'] for cold, warm in
+               zip((r for r in results if r['run'] == 'cold'), (r for r in results if r['run'] == 'warm')))
+    print(f"Same score cold and warm: {same}/{num_tests}")
+
+def run_endgame_benchmark(tester, num_tests):
+    """Print solve time by number of empty cells to help pick ENDGAME_EMPTY_CELLS"""
+    print("Benchmarking the endgame solver...")
+    results = tester.benchmark_endgame(num_tests=num_tests)
+
+    print("\nEndgame Solver:")
+    print("-" * 75)
+    print(f"{'Empty':<6} {'Avg Solve':<11} {'Max Solve':<11} {'Avg Nodes':<11} {'Depth 5 Time':<13} {'Depth 5 Result':<15}")
+    print("-" * 75)
+    for empty_cells in sorted(set(r['empty_cells'] for r in results)):
+        cell_results = [r for r in results if r['empty_cells'] == empty_cells]
+        count = len(cell_results)
+        avg_time = sum(r['solve_time'] for r in cell_results) / count
+        max_time = max(r['solve_time'] for r in cell_results)
+        avg_nodes = sum(r['nodes'] for r in cell_results) / count
+        heuristic_time = sum(r['heuristic_time'] for r in cell_results) / count
+        correct = sum(r['heuristic_correct'] for r in cell_results) / count
+        print(f"{empty_cells:<6} {avg_time:<11.6f} {max_time:<11.6f} {avg_nodes:<11.1f} {heuristic_time:<13.6f} {correct:<15.2%}")
+    print("-" * 75)
+
 if __name__ == "__main__":
-    print("Starting Connect Four AI Performance Testing...")
+    parser = argparse.ArgumentParser(description="Connect Four AI performance tests")
+    parser.add_argument('--ordering', action='store_true',
+                        help="only benchmark the move ordering strategies")
+    parser.add_argument('--depth', type=int, default=6,
+                        help="search depth for the move ordering and scaling benchmarks")
+    parser.add_argument('--scaling', action='store_true',
+                        help="only benchmark the root-parallel search with 1..N workers")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="largest worker count for the scaling benchmark")
+    parser.add_argument('--book', nargs='?', const=DEFAULT_BOOK_PATH,
+                        help="only report size, hit rate and probe time of an opening book")
+    parser.add_argument('--endgame', action='store_true',
+                        help="only benchmark the endgame solver by number of empty cells")
+    parser.add_argument('--bench', nargs='*', choices=list(BENCHMARK_CONFIGS), metavar='CONFIG',
+                        help="only run the corpus benchmark, for the given or all engine configurations")
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS_PATH,
+                        help="corpus file for the corpus benchmark")
+    parser.add_argument('--stats', action='store_true',
+                        help="add search statistics to the corpus benchmark CSV (slows the searches down)")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="seed of every random choice, so runs can be repeated")
+    parser.add_argument('--imports', action='store_true',
+                        help="only measure the import time of the engine and the modules using it")
+    parser.add_argument('--geometry', nargs='*', type=parse_geometry, metavar='ROWSxCOLUMNS[xCONNECT]',
+                        help="only benchmark nodes per second and latency on the given or default board sizes")
+    parser.add_argument('--negamax', action='store_true',
+                        help="only compare nodes, time and results of minimax and negamax")
+    parser.add_argument('--mirror', action='store_true',
+                        help="only compare table entries, hit rate and nodes with and without mirror keys")
+    parser.add_argument('--cache', action='store_true',
+                        help="compare move latency with an empty and a filled search cache, searching to --depth")
+    parser.add_argument('--verify', action='store_true',
+                        help="only check the bitboard evaluation, terminal detection, mirror symmetry and search cache")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
     tester = PerformanceTester()
+    if args.bench is not None:
+        run_corpus_benchmark(tester, args.corpus, args.bench or list(BENCHMARK_CONFIGS), args.seed, args.stats)
+        raise SystemExit
+
+    if args.verify:
+        mismatches = tester.verify_evaluation(num_positions=2000)
+        for mismatch in mismatches[:10]:
+            print(mismatch)
+        print(f"Evaluation check: {len(mismatches)} mismatches in 2000 positions")
+
+        terminal_mismatches = tester.verify_terminal_detection(num_positions=500)
+        for mismatch in terminal_mismatches[:10]:
+            print(mismatch)
+        print(f"Terminal detection check: {len(terminal_mismatches)} mismatches in 500 positions")
+
+        mirror_mismatches = tester.verify_mirror_symmetry(num_positions=300)
+        for mismatch in mirror_mismatches[:10]:
+            print(mismatch)
+        print(f"Mirror symmetry check: {len(mirror_mismatches)} mismatches in 300 positions")
+
+        cache_mismatches = tester.verify_search_cache()
+        for mismatch in cache_mismatches[:10]:
+            print(mismatch)
+        print(f"Search cache check: {len(cache_mismatches)} mismatches in 2000 records")
+        raise SystemExit(1 if mismatches or terminal_mismatches or mirror_mismatches or cache_mismatches else 0)
+
+    if args.geometry is not None:
+        run_geometry_benchmark(tester, args.geometry or BENCHMARK_GEOMETRIES, num_tests=10, depth=args.depth)
+        raise SystemExit
+
+    if args.negamax:
+        run_algorithm_comparison(tester, num_tests=15)
+        raise SystemExit
+
+    if args.mirror:
+        run_mirror_benchmark(tester, num_tests=10, depth=args.depth)
+        raise SystemExit
+
+    if args.cache:
+        run_cache_benchmark(tester, num_tests=20, depth=args.depth)
+        raise SystemExit
+
+    if args.imports:
+        run_import_benchmark()
+        raise SystemExit
+
+    if args.ordering:
+        run_ordering_benchmark(tester, num_tests=15, depth=args.depth)
+        raise SystemExit
+
+    if args.book:
+        stats = tester.benchmark_opening_book(OpeningBook(args.book), num_games=1000)
+        print(f"Opening book: {stats['entries']} positions, {stats['size_bytes']} bytes")
+        print(f"Hit rate: {stats['hit_rate']:.2%} of {stats['probes']} probes")
+        print(f"Probe time: {stats['avg_probe_time'] * 1e6:.1f}us average, {stats['max_probe_time'] * 1e6:.1f}us max")
+        raise SystemExit
+
+    if args.endgame:
+        run_endgame_benchmark(tester, num_tests=10)
+        raise SystemExit
+
+    if args.scaling:
+        run_scaling_benchmark(tester, num_tests=10, depth=args.depth, max_workers=args.workers)
+        raise SystemExit
+
+    print("Starting Connect Four AI Performance Testing...")
     
     # Run tests with 15 random board positions, testing each difficulty level
     print("Running performance tests...")
@@ -212,3 +1233,38 @@ if __name__ == "__main__":
     for depth, data in sorted(summary.items()):
         print(f"{data['difficulty']:<10} {depth:<6} {data['avg_time_with_pruning']:<15.6f} {data['avg_time_without_pruning']:<15.6f} {data['avg_speedup']:<5.2f}x")
     print("-" * 65)
+
+    print("\nTransposition Table:")
+    print("-" * 65)
+    print(f"{'Difficulty':<10} {'Depth':<6} {'Avg W/ Table':<15} {'Avg W/o Table':<15} {'Hit Rate':<8} {'Allocs':<6}")
+    print("-" * 65)
+    for depth, data in sorted(summary.items()):
+        print(f"{data['difficulty']:<10} {depth:<6} {data['avg_time_with_pruning']:<15.6f} {data['avg_time_without_table']:<15.6f} "
+              f"{data['tt_hit_rate']:<8.2%} {data['avg_allocations_per_search']:<6.1f}")
+    print("-" * 65)
+
+    print("\nSearch Statistics:")
+    print("-" * 65)
+    print(f"{'Difficulty':<10} {'Depth':<6} {'EBF':<6} {'First Move':<11} {'Leaf Evals':<11} {'Eval Time':<10} {'Win Checks':<10}")
+    print("-" * 65)
+    for depth, data in sorted(summary.items()):
+        print(f"{data['difficulty']:<10} {depth:<6} {data['avg_effective_branching_factor']:<6.2f} "
+              f"{data['avg_first_move_cutoff_rate']:<11.2%} {data['avg_leaf_evaluations']:<11.1f} "
+              f"{data['avg_eval_time']:<10.6f} {data['avg_win_check_time']:<10.6f}")
+    print("-" * 65)
+
+    # Check how closely each move sticks to its latency budget
+    print("\nRunning iterative deepening tests...")
+    budget_results = tester.test_iterative_deepening(num_tests=15, moves_range=(5, 25))
+
+    print("\nIterative Deepening:")
+    print("-" * 65)
+    print(f"{'Budget':<8} {'Avg Depth':<10} {'Avg Latency':<12} {'Max Latency':<12}")
+    print("-" * 65)
+    for time_budget in sorted(set(r['time_budget'] for r in budget_results)):
+        budget_tests = [r for r in budget_results if r['time_budget'] == time_budget]
+        avg_depth = sum(r['depth_reached'] for r in budget_tests) / len(budget_tests)
+        avg_latency = sum(r['latency'] for r in budget_tests) / len(budget_tests)
+        max_latency = max(r['latency'] for r in budget_tests)
+        print(f"{time_budget:<8} {avg_depth:<10.2f} {avg_latency:<12.6f} {max_latency:<12.6f}")
+    print("-" * 65)
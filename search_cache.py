@@ -0,0 +1,246 @@
+"""
+Persistent search cache shared across games and process restarts.
+
+The cache is a second-level transposition table on disk. Search results of
+nodes with at least CACHE_MIN_DEPTH plies left are appended to the cache file,
+and a node that misses the in-memory table is looked up here before it is
+searched, so the openings that come up again and again are answered from disk
+after a restart instead of searched from scratch.
+
+The file starts with a header followed by fixed-size records:
+
+    header: magic b'C4SC', version, rows, columns, connect, number of sorted records
+    record: table key (uint64), depth (uint8), score (int32), bound (uint8), move (uint8)
+
+The first records are sorted by key and probed with a binary search on the
+memory-mapped file; records appended after them are read into a dict the first
+time the cache is probed, and a later record for a key replaces an earlier one.
+Nothing is read before the first probe. Once the file holds more than
+max_records records it is compacted when the cache is flushed or closed, so
+never in the middle of a search: the deepest records are kept, newest first
+among equal depths, and written back sorted by key.
+
+One process writes to a cache: the first to store a record takes an exclusive
+lock on the file, and a cache opened by another process while it is held turns
+read-only. Any number of processes can open the same file with readonly=True.
+Appends only add whole records past the end a reader has mapped and compaction
+replaces the file with os.replace, so readers always see a consistent file.
+"""
+import mmap
+import os
+import struct
+
+try:
+    import fcntl
+except ImportError:
+    # No file locks on Windows, one writer is up to the user there
+    fcntl = None
+
+from bitboard import STANDARD
+
+MAGIC = b'C4SC'
+VERSION = 1
+HEADER = struct.Struct('<4sHBBBI')
+RECORD = struct.Struct('<QBiBB')
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'search_cache.bin')
+
+# Records kept before the file is compacted, about 3 MB
+DEFAULT_MAX_RECORDS = 200000
+
+# Fraction of max_records left after a compaction, so it does not run again right away
+COMPACTED_FRACTION = 0.75
+
+
+class SearchCache:
+    """Append-only, memory-mapped file of (key, depth, score, bound, move) records"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_records=DEFAULT_MAX_RECORDS, readonly=False, geometry=STANDARD):
+        # Table keys are a position key times two plus the side to move
+        if geometry.columns * geometry.column_height + 1 > 64:
+            raise ValueError(f"Keys of a {geometry.rows} x {geometry.columns} board do not fit in a cache record")
+
+        self.path = path
+        self.max_records = max_records
+        self.readonly = readonly
+        self.geometry = geometry
+        self.loaded = False
+        self.data = None
+        self.sorted_count = 0
+        self.record_count = 0
+        # Records past the sorted ones, read from the file or stored by this process
+        self.tail = {}
+        self.writer = None
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def load(self):
+        """Map the file and read its unsorted records, on the first use of the cache"""
+        self.loaded = True
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < HEADER.size:
+            return
+
+        with open(self.path, 'rb') as cache_file:
+            self.data = mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, rows, columns, connect, self.sorted_count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{self.path} is not a version {VERSION} search cache")
+        if (rows, columns, connect) != self.geometry.shape():
+            self.close()
+            raise ValueError(f"{self.path} caches a {rows} x {columns} connect {connect} board")
+
+        # A record cut short by an interrupted write is ignored
+        self.record_count = (len(self.data) - HEADER.size) // RECORD.size
+        for index in range(self.sorted_count, self.record_count):
+            key, *entry = RECORD.unpack_from(self.data, HEADER.size + index * RECORD.size)
+            self.tail[key] = tuple(entry)
+
+    def probe(self, key):
+        """Return the (depth, score, bound, move) stored for key, or None"""
+        if not self.loaded:
+            self.load()
+        self.probes += 1
+
+        entry = self.tail.get(key)
+        if entry is None:
+            entry = self.find_sorted(key)
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    def find_sorted(self, key):
+        """Binary search the sorted records for key"""
+        data = self.data
+        low, high = 0, self.sorted_count
+        while low < high:
+            middle = (low + high) // 2
+            record_key, *entry = RECORD.unpack_from(data, HEADER.size + middle * RECORD.size)
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                return tuple(entry)
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        """Append a record unless the cache already holds a deeper one for key"""
+        if self.readonly:
+            return
+        if not self.loaded:
+            self.load()
+
+        entry = self.tail.get(key)
+        if entry is None:
+            entry = self.find_sorted(key)
+        if entry is not None and entry[0] > depth:
+            return
+
+        if self.writer is None and not self.open_writer():
+            return
+        self.writer.write(RECORD.pack(key, depth, score, bound, move))
+        self.tail[key] = (depth, score, bound, move)
+        self.record_count += 1
+        self.stores += 1
+
+    def open_writer(self):
+        """Lock the file and open it for appending, or turn read-only if another process writes to it"""
+        writer = open(self.path, 'ab')
+        if fcntl is not None:
+            try:
+                fcntl.flock(writer.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                writer.close()
+                self.readonly = True
+                return False
+            # A writer that compacted the file since it was opened replaced it
+            if os.fstat(writer.fileno()).st_ino != os.stat(self.path).st_ino:
+                writer.close()
+                self.readonly = True
+                return False
+
+        # The last writer may have changed the file since it was read
+        self.unmap()
+        try:
+            self.load()
+        except ValueError:
+            writer.close()
+            raise
+        if self.data is None:
+            # New file: empty header with nothing sorted yet
+            writer.truncate(0)
+            writer.write(HEADER.pack(MAGIC, VERSION, *self.geometry.shape(), 0))
+        else:
+            # Cut off a record left half written, records appended after it would be misaligned
+            writer.truncate(HEADER.size + self.record_count * RECORD.size)
+        self.writer = writer
+        return True
+
+    def flush(self):
+        """Write out the stored records, and compact the file once it holds too many"""
+        if self.writer is not None:
+            self.writer.flush()
+            if self.record_count > self.max_records:
+                self.compact()
+
+    def compact(self, keep=None):
+        """Rewrite the file with the deepest, then newest, records sorted by key"""
+        if keep is None:
+            keep = int(self.max_records * COMPACTED_FRACTION)
+        if self.readonly or self.writer is None and not self.open_writer():
+            return
+
+        # Later records of a key replace earlier ones, and the order of the
+        # records is their age
+        entries = {}
+        for index in range(self.sorted_count):
+            key, *entry = RECORD.unpack_from(self.data, HEADER.size + index * RECORD.size)
+            entries[key] = (entry[0], index, tuple(entry))
+        for age, (key, entry) in enumerate(self.tail.items(), self.sorted_count):
+            entries[key] = (entry[0], age, entry)
+
+        kept = sorted(entries.items(), key=lambda item: item[1][:2], reverse=True)[:keep]
+        kept.sort()
+
+        temporary_path = self.path + '.tmp'
+        with open(temporary_path, 'wb') as cache_file:
+            cache_file.write(HEADER.pack(MAGIC, VERSION, *self.geometry.shape(), len(kept)))
+            for key, (_, _, entry) in kept:
+                cache_file.write(RECORD.pack(key, *entry))
+        os.replace(temporary_path, self.path)
+
+        # The lock stays on the replaced file until the new one is locked
+        replaced = self.writer
+        self.writer = None
+        self.open_writer()
+        replaced.close()
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+    def size_bytes(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def __len__(self):
+        if not self.loaded:
+            self.load()
+        return self.sorted_count + len(self.tail)
+
+    def close(self):
+        """Write out pending records, release the lock and unmap the file; the next probe opens it again"""
+        if self.writer is not None:
+            self.flush()
+            self.writer.close()
+            self.writer = None
+        self.unmap()
+
+    def unmap(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.loaded = False
+        self.sorted_count = 0
+        self.record_count = 0
+        self.tail = {}
@@ -0,0 +1,143 @@
+"""
+Optional statistics collector for the minimax and negamax searches.
+
+The collector is attached to an engine by replacing a few of its methods with
+counting and timing wrappers on the engine instance. The methods themselves
+never check whether statistics are on, so a search without a collector runs
+exactly the same code as before and pays nothing for it.
+"""
+import time
+
+from bitboard import STANDARD
+
+# Engine methods replaced while a collector is attached
+WRAPPED_METHODS = ('minimax', 'negamax', 'score_leaf', 'leaf_value', 'score_position', 'is_end_of_game')
+
+
+class SearchStats:
+    """Counts nodes per ply, leaf evaluations and where the search spends its time"""
+
+    def __init__(self):
+        self.engine = None
+        # Indexed by the number of pieces on the board at the node, sized
+        # for the engine's board by attach()
+        self.nodes_by_ply = [0] * (STANDARD.cells + 1)
+        self.reset()
+
+    def reset(self):
+        """Zero every counter before a new search"""
+        # Cleared in place, the wrappers hold on to the list
+        self.nodes_by_ply[:] = [0] * len(self.nodes_by_ply)
+        self.leaf_evaluations = 0
+        self.terminal_leaves = 0
+        self.eval_time = 0.0
+        self.win_check_time = 0.0
+        self.iteration_nodes = []
+
+    def attach(self, engine):
+        """Start collecting for every search engine runs"""
+        self.engine = engine
+        self.nodes_by_ply[:] = [0] * (engine.geometry.cells + 1)
+        minimax = engine.minimax
+        negamax = engine.negamax
+        score_leaf = engine.score_leaf
+        leaf_value = engine.leaf_value
+        score_position = engine.score_position
+        is_end_of_game = engine.is_end_of_game
+        nodes_by_ply = self.nodes_by_ply
+        perf_counter = time.perf_counter
+
+        def counted_minimax(board, depth, alpha, beta, max_player, first_move=None):
+            nodes_by_ply[board.num_moves] += 1
+            return minimax(board, depth, alpha, beta, max_player, first_move)
+
+        def counted_negamax(board, depth, alpha, beta, color, first_move=None):
+            nodes_by_ply[board.num_moves] += 1
+            return negamax(board, depth, alpha, beta, color, first_move)
+
+        def counted_score_leaf(board):
+            nodes_by_ply[board.num_moves] += 1
+            return score_leaf(board)
+
+        def counted_leaf_value(board, is_terminal):
+            self.leaf_evaluations += 1
+            if is_terminal:
+                self.terminal_leaves += 1
+            return leaf_value(board, is_terminal)
+
+        def timed_score_position(board):
+            start_time = perf_counter()
+            score = score_position(board)
+            self.eval_time += perf_counter() - start_time
+            return score
+
+        def timed_is_end_of_game(board):
+            start_time = perf_counter()
+            is_terminal = is_end_of_game(board)
+            self.win_check_time += perf_counter() - start_time
+            return is_terminal
+
+        # Instance attributes shadow the class methods, so recursive calls
+        # inside minimax go through the wrappers too
+        engine.minimax = counted_minimax
+        engine.negamax = counted_negamax
+        engine.score_leaf = counted_score_leaf
+        engine.leaf_value = counted_leaf_value
+        engine.score_position = timed_score_position
+        engine.is_end_of_game = timed_is_end_of_game
+
+    def detach(self):
+        """Put the engine's own methods back"""
+        for name in WRAPPED_METHODS:
+            self.engine.__dict__.pop(name, None)
+        self.engine = None
+
+    def record_iteration(self, nodes):
+        """Remember the nodes searched by one completed iteration of iterative deepening"""
+        self.iteration_nodes.append(nodes)
+
+    def cutoff_indices(self):
+        """Cutoffs by position of the cutting move, as counted by the engine's orderer"""
+        orderer = self.engine.move_orderer if self.engine is not None else None
+        return orderer.cutoff_indices[:] if orderer is not None else [0] * STANDARD.columns
+
+    def nodes(self):
+        return sum(self.nodes_by_ply)
+
+    def plies(self):
+        """Return the node counts from the root ply to the deepest ply reached"""
+        searched = [ply for ply, count in enumerate(self.nodes_by_ply) if count]
+        if not searched:
+            return []
+        return self.nodes_by_ply[searched[0]:searched[-1] + 1]
+
+    def effective_branching_factor(self):
+        """Growth in nodes per extra ply of depth
+
+        With iterative deepening this is the ratio of the nodes of the last two
+        iterations, otherwise the d-th root of the nodes of a depth d search.
+        """
+        if len(self.iteration_nodes) >= 2:
+            return self.iteration_nodes[-1] / self.iteration_nodes[-2]
+
+        plies = self.plies()
+        depth = len(plies) - 1
+        return sum(plies) ** (1 / depth) if depth > 0 else 0.0
+
+    def first_move_cutoff_rate(self):
+        cutoff_indices = self.cutoff_indices()
+        cutoffs = sum(cutoff_indices)
+        return cutoff_indices[0] / cutoffs if cutoffs else 0.0
+
+    def summary(self):
+        """Return the statistics as a flat dict, ready for a CSV row"""
+        return {
+            'nodes_by_ply': '/'.join(str(count) for count in self.plies()),
+            'leaf_evaluations': self.leaf_evaluations,
+            'terminal_leaves': self.terminal_leaves,
+            'cutoff_indices': '/'.join(str(count) for count in self.cutoff_indices()),
+            'first_move_cutoff_rate': self.first_move_cutoff_rate(),
+            'effective_branching_factor': self.effective_branching_factor(),
+            'eval_time': self.eval_time,
+            'win_check_time': self.win_check_time
+        }
@@ -0,0 +1,404 @@
+"""
+Asyncio game server for many simultaneous games.
+
+Clients connect over TCP or a Unix socket and exchange one JSON object per
+line. Every request has an "op" and may carry an "id", which is copied into
+the response:
+
+    {"op": "new", "config": "depth=4", "first": "computer"}
+        -> {"ok": true, "session": "1", "moves": "3", "computer_move": 3, "result": null}
+    {"op": "move", "session": "1", "column": 2, "deadline": 2.0}
+        -> {"ok": true, "session": "1", "moves": "324", "computer_move": 4, "result": null}
+    {"op": "state", "session": "1"}
+    {"op": "close", "session": "1"}
+    {"op": "stats"}
+
+A session is one game between the client and the computer, with its own
+board and engine configuration (as for arena.py). result is "win", "loss" or
+"draw" from the client's point of view once the game is over. Sessions belong
+to the connection that created them and end when it closes.
+
+The computer's moves are searched by the engine on a bounded process pool.
+When more searches are queued than the pool can work off, new moves are
+refused with code "busy" instead of queuing without bound, and a connection
+with too many unanswered requests is not read from until some are answered.
+Every move has a deadline, the server's default or the request's "deadline"
+in seconds; the search stops in time to meet it, a search still queued when
+it passes is dropped, and the client gets code "timeout" with the board as it
+was before the move. A search that fails, for example because a worker
+process died, gets code "failed", also with the move taken back; the pool is
+replaced when that happens. Other errors have code "invalid".
+
+    python3 server.py --port 4004 --workers 4 --config depth=6
+"""
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import itertools
+import json
+import os
+import time
+
+from bitboard import Position, PLAYER, COMPUTER
+from arena import parse_config
+from corpus import position_from_moves
+from engine import Engine
+from move_ordering import MoveOrderer
+
+DEFAULT_PORT = 4004
+
+# Searches queued per worker process before new moves are refused
+QUEUE_PER_WORKER = 8
+
+# Requests of one connection being served at once before it is no longer read
+MAX_IN_FLIGHT_PER_CONNECTION = 64
+
+# Seconds a move may take by default, from receiving it to sending the answer
+DEFAULT_DEADLINE = 5.0
+
+# Share of the time left at the start of a search it may use, the rest covers
+# passing the result back and writing the answer
+DEADLINE_SEARCH_SHARE = 0.8
+
+# Longest request line accepted
+MAX_LINE_BYTES = 4096
+
+# Engines a worker process keeps for different configurations, each with its
+# own transposition table of several MB
+MAX_WORKER_ENGINES = 4
+
+# Engines of the worker process by engine_key, least recently used first
+worker_engines = {}
+
+
+def engine_key(config):
+    """Return the settings of a parsed configuration that need their own engine
+
+    Texts that parse to the same settings share an engine. The depth is part
+    of the key, since the table entries of a deeper search would make a
+    depth-capped configuration stronger; time and node budgets only limit
+    one search.
+    """
+    return (config['max_depth'], config['algorithm'], config['ordering'],
+            tuple(sorted(config['weights'].items())))
+
+
+def search_move(moves, config, deadline):
+    """Return (column, score, depth, nodes) for the side to move, or None if the deadline passed
+
+    Runs in a worker process. deadline is in time.time() seconds, since it is
+    compared in another process than the one that set it.
+    """
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        return None
+
+    key = engine_key(config)
+    engine = worker_engines.pop(key, None)
+    if engine is None:
+        if len(worker_engines) >= MAX_WORKER_ENGINES:
+            del worker_engines[next(iter(worker_engines))]
+        engine = Engine(weights=config['weights'])
+        engine.algorithm = config['algorithm']
+        engine.move_orderer = MoveOrderer(config['ordering'])
+    # Inserted again, so the dict stays in order of last use
+    worker_engines[key] = engine
+    # Table entries are valid in every game, the killers and history are not
+    engine.move_orderer.clear()
+
+    position = position_from_moves(moves)
+    time_budget = remaining * DEADLINE_SEARCH_SHARE
+    if config['time_budget'] is not None:
+        time_budget = min(time_budget, config['time_budget'])
+    column, value = engine.iterative_deepening(position, config['max_depth'], time_budget, config['node_budget'],
+                                               max_player=position.num_moves % 2 == 0)
+    return column, value, engine.completed_depth, engine.nodes
+
+
+class RequestError(Exception):
+    """Raised while serving a request to answer it with an error"""
+
+    def __init__(self, message, code='invalid'):
+        super().__init__(message)
+        self.code = code
+
+
+class Session:
+    """Board and engine configuration of one game"""
+
+    def __init__(self, session_id, config):
+        self.id = session_id
+        self.config = config
+        self.position = Position()
+        self.moves = ''
+        self.result = None
+        # Set while the computer's move is searched, so moves cannot overlap
+        self.busy = False
+
+    def play(self, column):
+        piece = PLAYER if self.position.num_moves % 2 == 0 else COMPUTER
+        self.position.play(column, piece)
+        self.moves += str(column)
+
+    def undo(self):
+        self.position.undo()
+        self.moves = self.moves[:-1]
+
+    def update_result(self, computer_moved):
+        if self.position.last_move_wins():
+            self.result = 'loss' if computer_moved else 'win'
+        elif self.position.is_full():
+            self.result = 'draw'
+
+    def state(self):
+        return {'session': self.id, 'moves': self.moves, 'result': self.result}
+
+
+class GameServer:
+    """Sessions of all connections and the process pool searching their moves"""
+
+    def __init__(self, config_text='depth=4', workers=None, max_queued=None, deadline=DEFAULT_DEADLINE):
+        parse_config(config_text)
+        self.config_text = config_text
+        self.workers = workers or os.cpu_count()
+        self.max_queued = max_queued or self.workers * QUEUE_PER_WORKER
+        self.deadline = deadline
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.sessions = {}
+        self.session_ids = itertools.count(1)
+        self.queued = 0
+        self.counters = {'moves': 0, 'busy': 0, 'timeouts': 0, 'failures': 0, 'errors': 0}
+
+    async def handle_connection(self, reader, writer):
+        """Serve the requests of one client until it disconnects"""
+        owned = set()
+        in_flight = asyncio.Semaphore(MAX_IN_FLIGHT_PER_CONNECTION)
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def serve(line):
+            try:
+                response = await self.serve_line(line, owned)
+                async with write_lock:
+                    writer.write((json.dumps(response) + '\n').encode())
+                    await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                in_flight.release()
+
+        try:
+            while True:
+                # Waiting here stops reading, so the client's writes back up
+                await in_flight.acquire()
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break
+                if not line:
+                    break
+                task = asyncio.create_task(serve(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            for session_id in owned:
+                self.sessions.pop(session_id, None)
+            writer.close()
+
+    async def serve_line(self, line, owned):
+        """Return the response to one request line"""
+        received = time.time()
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                raise RequestError("request is not JSON")
+            if not isinstance(request, dict):
+                raise RequestError("request is not a JSON object")
+            request_id = request.get('id')
+
+            op = request.get('op')
+            if op == 'new':
+                response = await self.new_session(request, owned, received)
+            elif op == 'move':
+                response = await self.move(request, owned, received)
+            elif op == 'state':
+                response = self.find_session(request, owned).state()
+            elif op == 'close':
+                session = self.find_session(request, owned)
+                if session.busy:
+                    raise RequestError("the computer is still moving")
+                owned.discard(session.id)
+                del self.sessions[session.id]
+                response = {'session': session.id}
+            elif op == 'stats':
+                response = dict(self.counters, sessions=len(self.sessions), queued=self.queued)
+            else:
+                raise RequestError(f"unknown op {op!r}")
+            response['ok'] = True
+        except RequestError as error:
+            counter = {'busy': 'busy', 'timeout': 'timeouts', 'failed': 'failures'}.get(error.code, 'errors')
+            self.counters[counter] += 1
+            response = {'ok': False, 'error': str(error), 'code': error.code}
+
+        if request_id is not None:
+            response['id'] = request_id
+        return response
+
+    def find_session(self, request, owned):
+        session_id = request.get('session')
+        if session_id not in owned:
+            raise RequestError(f"no session {session_id!r} on this connection")
+        return self.sessions[session_id]
+
+    def request_deadline(self, request, received):
+        deadline = request.get('deadline', self.deadline)
+        if isinstance(deadline, bool) or not isinstance(deadline, (int, float)) or deadline <= 0:
+            raise RequestError("deadline must be a positive number of seconds")
+        return received + deadline
+
+    async def new_session(self, request, owned, received):
+        config_text = request.get('config', self.config_text)
+        try:
+            config = parse_config(config_text)
+        except (ValueError, AttributeError) as error:
+            raise RequestError(f"bad config: {error}")
+        first = request.get('first', 'player')
+        if first not in ('player', 'computer'):
+            raise RequestError("first must be 'player' or 'computer'")
+        deadline = self.request_deadline(request, received)
+
+        session = Session(str(next(self.session_ids)), config)
+        self.sessions[session.id] = session
+        owned.add(session.id)
+
+        response = session.state()
+        if first == 'computer':
+            try:
+                response['computer_move'] = await self.computer_move(session, deadline)
+            except RequestError:
+                # Nothing was played, so the session is dropped again
+                owned.discard(session.id)
+                del self.sessions[session.id]
+                raise
+            response.update(session.state())
+        return response
+
+    async def move(self, request, owned, received):
+        session = self.find_session(request, owned)
+        column = request.get('column')
+        deadline = self.request_deadline(request, received)
+        if session.busy:
+            raise RequestError("the computer is still moving")
+        if session.result is not None:
+            raise RequestError("the game is over")
+        if isinstance(column, bool) or not isinstance(column, int) or not session.position.can_play(column):
+            raise RequestError(f"column {column!r} cannot be played")
+
+        session.play(column)
+        session.update_result(computer_moved=False)
+        response = {}
+        if session.result is None:
+            try:
+                response['computer_move'] = await self.computer_move(session, deadline)
+            except RequestError:
+                # The move is taken back, so the client can send it again
+                session.undo()
+                raise
+        response.update(session.state())
+        return response
+
+    async def computer_move(self, session, deadline):
+        """Search and play the computer's move of session on the process pool"""
+        if self.queued >= self.max_queued:
+            raise RequestError("too many moves queued, try again later", 'busy')
+
+        executor = self.executor
+        try:
+            future = executor.submit(search_move, session.moves, session.config, deadline)
+        except BrokenProcessPool:
+            self.replace_pool(executor)
+            raise RequestError("the search workers were restarted, try again", 'failed')
+        session.busy = True
+        self.queued += 1
+        # A search that already runs cannot be cancelled, so it counts until
+        # its worker is free again, not until the client gets its answer. The
+        # callback runs on the pool's thread, so the count changes on the loop
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self.search_done))
+        try:
+            # The worker keeps to the deadline itself, the grace covers a slow handover
+            result = await asyncio.wait_for(asyncio.wrap_future(future), deadline - time.time() + 1.0)
+        except asyncio.TimeoutError:
+            future.cancel()
+            result = None
+        except BrokenProcessPool:
+            self.replace_pool(executor)
+            raise RequestError("a search worker stopped, try again", 'failed')
+        except Exception as error:
+            raise RequestError(f"the search failed: {error}", 'failed')
+        finally:
+            session.busy = False
+
+        if result is None:
+            raise RequestError("the deadline passed before the move was searched", 'timeout')
+        column = result[0]
+        session.play(column)
+        session.update_result(computer_moved=True)
+        self.counters['moves'] += 1
+        return column
+
+    def search_done(self):
+        self.queued -= 1
+
+    def replace_pool(self, executor):
+        """Start a new process pool in place of a broken one, once however many searches saw it break"""
+        if self.executor is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+async def serve(server, host='127.0.0.1', port=DEFAULT_PORT, unix_path=None):
+    if unix_path is not None:
+        listener = await asyncio.start_unix_server(server.handle_connection, unix_path, limit=MAX_LINE_BYTES)
+        address = unix_path
+    else:
+        listener = await asyncio.start_server(server.handle_connection, host, port, limit=MAX_LINE_BYTES)
+        address = f"{host}:{port}"
+    print(f"Serving games on {address} with {server.workers} workers")
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve Connect Four games over JSON lines")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="address to listen on")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT,
+                        help="TCP port to listen on")
+    parser.add_argument('--unix', default=None,
+                        help="listen on this Unix socket path instead of TCP")
+    parser.add_argument('--config', default='depth=4',
+                        help="engine configuration of sessions that do not give one, as for arena.py")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of processes searching the computer's moves")
+    parser.add_argument('--max-queued', type=int, default=None,
+                        help="searches queued before moves are refused, default 8 per worker")
+    parser.add_argument('--deadline', type=float, default=DEFAULT_DEADLINE,
+                        help="seconds a move may take unless the request gives its own deadline")
+    args = parser.parse_args()
+
+    server = GameServer(args.config, args.workers, args.max_queued, args.deadline)
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
@@ -0,0 +1,72 @@
+"""
+Transposition table for the minimax search.
+
+Results are stored in a fixed number of slots indexed by position key, so the
+memory used by the table never grows past its configured size. When two
+positions land in the same slot the replacement policy decides which one is
+kept.
+"""
+
+# Bound types of a stored score
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+# A prime slot count spreads the structured bitboard keys evenly
+DEFAULT_SIZE = 262103
+
+REPLACEMENT_POLICIES = ('depth', 'always')
+
+
+class TranspositionTable:
+    """Fixed-size table of (depth, score, bound, best move) keyed by position"""
+
+    def __init__(self, size=DEFAULT_SIZE, replacement='depth'):
+        if size < 1:
+            raise ValueError("Transposition table size must be at least 1")
+        if replacement not in REPLACEMENT_POLICIES:
+            raise ValueError(f"Unknown replacement policy: {replacement}")
+
+        self.size = size
+        self.replacement = replacement
+        self.clear()
+
+    def clear(self):
+        """Empty every slot and reset the counters"""
+        self.keys = [None] * self.size
+        self.entries = [None] * self.size
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+        self.overwrites = 0
+
+    def probe(self, key):
+        """Return the (depth, score, bound, move) stored for key, or None"""
+        index = key % self.size
+        if self.keys[index] == key:
+            self.hits += 1
+            return self.entries[index]
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        index = key % self.size
+        stored_key = self.keys[index]
+
+        if stored_key is not None and stored_key != key:
+            # Depth-preferred keeps the entry that cost more to compute
+            if self.replacement == 'depth' and self.entries[index][0] > depth:
+                return
+            self.overwrites += 1
+
+        self.keys[index] = key
+        self.entries[index] = (depth, score, bound, move)
+
+    def hit_rate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def __len__(self):
+        return self.size - self.keys.count(None)
@@ -0,0 +1,134 @@
+"""
+Precomputed winning-line tables and vectorized scoring of array boards.
+
+Boards here are ROWS x COLUMNS numpy arrays with row 0 at the bottom, as
+returned by Position.to_array(). Cells are addressed by their flat row-major
+index (row * COLUMNS + col), so a whole set of windows can be read from a
+board with a single fancy-indexing gather and reduced along the last axis.
+"""
+import numpy as np
+
+from bitboard import ROWS, COLUMNS, PLAYER, COMPUTER, EMPTY, EVALUATION_BOARD
+from engine import DEFAULT_WEIGHTS
+
+# Flat index used for "below the bottom row"; the padded board stores a
+# non-empty value there so bottom-row cells always count as supported
+FLOOR = ROWS * COLUMNS
+
+# (row step, column step) of each line direction
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (-1, 1))
+
+
+def line_windows(length):
+    """Return a (num_windows, length) array of the flat cells of every line window"""
+    windows = []
+    for row_step, col_step in DIRECTIONS:
+        for row in range(ROWS):
+            for col in range(COLUMNS):
+                end_row = row + row_step * (length - 1)
+                end_col = col + col_step * (length - 1)
+                if 0 <= end_row < ROWS and end_col < COLUMNS:
+                    windows.append([(row + row_step * i) * COLUMNS + col + col_step * i
+                                    for i in range(length)])
+    return np.array(windows, dtype=np.intp).reshape(-1, length)
+
+
+def support_cells(windows):
+    """Return the flat index of the cell below every window cell, or FLOOR"""
+    below = windows - COLUMNS
+    return np.where(below < 0, FLOOR, below)
+
+
+def cell_windows(windows):
+    """Map every flat cell to the ids of the windows that contain it"""
+    return [np.flatnonzero((windows == cell).any(axis=1)) for cell in range(ROWS * COLUMNS)]
+
+
+# The 69 four-cell windows, the cells they need underneath, and the reverse map
+WINDOWS = line_windows(4)
+WINDOW_SUPPORT = support_cells(WINDOWS)
+CELL_WINDOWS = cell_windows(WINDOWS)
+
+# Shorter windows used to count 2- and 3-in-a-row lines
+LINE_WINDOWS = {length: line_windows(length) for length in (2, 3, 4)}
+
+FLAT_EVALUATION_BOARD = np.array(EVALUATION_BOARD).ravel()
+
+
+def flatten(boards):
+    """Return (N, ROWS * COLUMNS + 1) flat cells, the last one a non-empty FLOOR cell"""
+    boards = np.asarray(boards)
+    flat = boards.reshape(len(boards), -1)
+    return np.concatenate([flat, np.full((len(flat), 1), -1, dtype=flat.dtype)], axis=1)
+
+
+def count_lines_batch(cells, piece, x_in_a_row):
+    """Count the x-in-a-row lines of piece on every board of flattened cells"""
+    return (cells[:, LINE_WINDOWS[x_in_a_row]] == piece).all(axis=2).sum(axis=1)
+
+
+def has_possible_four_batch(cells, piece):
+    window_cells = cells[:, WINDOWS]
+    empty = window_cells == EMPTY
+    three = ((window_cells == piece).sum(axis=2) == 3) & (empty.sum(axis=2) == 1)
+    # The empty cell has to be playable: the cell under it is filled
+    playable = (empty & (cells[:, WINDOW_SUPPORT] != EMPTY)).any(axis=2)
+    return (three & playable).any(axis=1)
+
+
+def score_boards(boards, weights=None):
+    """Score a stack of boards shaped (N, ROWS, COLUMNS) in one vectorized pass
+
+    Uses DEFAULT_WEIGHTS overridden by the given weights, like Engine.set_weights.
+    """
+    weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+    cells = flatten(boards)
+    board_cells = cells[:, :FLOOR]
+
+    scores = -(FLAT_EVALUATION_BOARD * (board_cells == COMPUTER)).sum(axis=1)
+    scores += (FLAT_EVALUATION_BOARD * (board_cells == PLAYER)).sum(axis=1)
+
+    scores -= count_lines_batch(cells, COMPUTER, 3) * weights['computer_triples']
+    scores -= count_lines_batch(cells, COMPUTER, 2) * weights['computer_pairs']
+    scores += count_lines_batch(cells, PLAYER, 3) * weights['player_triples']
+    scores += count_lines_batch(cells, PLAYER, 2) * weights['player_pairs']
+
+    scores += has_possible_four_batch(cells, PLAYER) * weights['player_threat']
+    scores -= has_possible_four_batch(cells, COMPUTER) * weights['computer_threat']
+
+    return scores
+
+
+def boards_from_bitboards(player_masks, computer_masks):
+    """Unpack N pairs of Position bitboards into a (N, ROWS, COLUMNS) array"""
+    # Bit index of every cell in row-major order
+    bits = np.array([[col * (ROWS + 1) + row for col in range(COLUMNS)] for row in range(ROWS)],
+                    dtype=np.uint64)
+    player = (np.asarray(player_masks, dtype=np.uint64)[:, None, None] >> bits) & 1
+    computer = (np.asarray(computer_masks, dtype=np.uint64)[:, None, None] >> bits) & 1
+    return (player * PLAYER + computer * COMPUTER).astype(int)
+
+
+def score_positions(positions, weights=None):
+    """Score a list of Position objects in one vectorized pass"""
+    boards = boards_from_bitboards([position.bitboards[PLAYER] for position in positions],
+                                   [position.bitboards[COMPUTER] for position in positions])
+    return score_boards(boards, weights)
+
+
+def count_lines(board, piece, x_in_a_row):
+    return int(count_lines_batch(flatten([board]), piece, x_in_a_row)[0])
+
+
+def check_winner(board, piece):
+    return count_lines(board, piece, 4) > 0
+
+
+def has_possible_four(board, piece):
+    """Check to see if next move would lead to a 4-in-a-row"""
+    return bool(has_possible_four_batch(flatten([board]), piece)[0])
+
+
+def score_position(board, weights=None):
+    """Vectorized equivalent of Engine.score_position for an array board"""
+    return int(score_boards([board], weights)[0])